@@ -1,104 +1,225 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import requests
+import aiohttp
+import asyncio
 from lxml import html
+from listing_parser import parse_vcards, read_pagination, page_count_from_pagination
 import csv
 import argparse
+import random
 import time
+import urllib.parse  # Import for encoding spaces as '+'
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone as dt_timezone
 
 timezone = "PST"
 
-def get_last_page_number(url, headers):
-    response = requests.get(url, verify=True, headers=headers)
-    if response.status_code == 200:
-        parser = html.fromstring(response.text)
-        last_page_number_xpath = "//div[@class='pagination']//ul/li[last()-1]//text()"
-        try:
-            last_page_number = int(parser.xpath(last_page_number_xpath)[0])
-            return last_page_number
-        except IndexError:
-            return 1
-    return None
+BASE_URL = "https://www.yellowpages.com"
+
+# Requests in flight at once, across every place and keyword
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 6
+# Full-jitter exponential backoff: attempt n waits up to BACKOFF_BASE * 2**n seconds
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+# Statuses worth retrying; any other non-200 answer is final
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 headers = {
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
-    'Accept-Encoding': 'gzip, deflate, br',
+    'Accept-Encoding': 'gzip, deflate',
     'Accept-Language': 'en-GB,en;q=0.9,en-US;q=0.8,ml;q=0.7',
     'Cache-Control': 'max-age=0',
-    'Connection': 'keep-alive',
-    'Host': 'www.yellowpages.com',
     'Upgrade-Insecure-Requests': '1',
     'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/64.0.3282.140 Safari/537.36'
 }
 
+FIELDNAMES = ['BusinessName', 'Phone', 'Address', 'Location', 'Industry', 'TimeZone', 'IdStatus']
+
+
 def remove_commas(data):
     """Removes commas from all string values in a dictionary."""
     return {key: value.replace(',', '') if isinstance(value, str) else value for key, value in data.items()}
 
 
-def parse_listing(original_keyword, place, page):
-    url = f"https://www.yellowpages.com/search?search_terms={original_keyword}&geo_location_terms={place}&page={page}"
-
-    print("Retrieving", url)
-
-    for retry in range(10):
-        try:
-            response = requests.get(url, verify=True, headers=headers)
-            if response.status_code == 200:
-                parser = html.fromstring(response.text)
-                parser.make_links_absolute("https://www.yellowpages.com")
-
-                XPATH_LISTINGS = "//div[@class='search-results organic']//div[@class='v-card']"
-                listings = parser.xpath(XPATH_LISTINGS)
-                scraped_results = []
-
-                for results in listings:
-                    XPATH_BUSINESS_NAME = ".//a[@class='business-name']//text()"
-                    XPATH_TELEPHONE = ".//div[@class='phones phone primary']//text()"
-                    XPATH_STREET = ".//div[@class='street-address']//text()"
-                    XPATH_LOCALITY = ".//div[@class='locality']//text()"
-
-                    business_name = ''.join(results.xpath(XPATH_BUSINESS_NAME)).strip()
-                    telephone = ''.join(results.xpath(XPATH_TELEPHONE)).strip()
-                    street = ''.join(results.xpath(XPATH_STREET)).strip()
-                    locality = ''.join(results.xpath(XPATH_LOCALITY)).strip()
-
-                    # Add timezone and IdStatus
-                    business_details = {
-                        'BusinessName': business_name,
-                        'Phone': telephone,
-                        'Address': street,
-                        'Location': locality,
-                        'Industry': original_keyword,  # Use the original keyword
-                        'TimeZone': timezone,  # Default value; update as needed
-                        'IdStatus': 5  # Default value
-                    }
-                    business_details = remove_commas(business_details)
-                    scraped_results.append(business_details)
-
-                return scraped_results
-
-            elif response.status_code == 404:
-                print(f"No results found for {original_keyword} in {place}")
-                break
-            else:
-                print("Failed to process the page.")
-                return []
-
-        except Exception as e:
-            print(f"Error occurred: {e}")
-            time.sleep(1)
-    return []
-
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(dt_timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Randomized exponential delay before retry number `attempt`, never shorter than Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def parse_results(parser, original_keyword):
+    """Business rows of one parsed search results page"""
+    scraped_results = []
+
+    for business_name, telephone, street, locality in parse_vcards(parser):
+        # Add timezone and IdStatus
+        business_details = {
+            'BusinessName': business_name,
+            'Phone': telephone,
+            'Address': street,
+            'Location': locality,
+            'Industry': original_keyword,  # Use the original keyword
+            'TimeZone': timezone,  # Default value; update as needed
+            'IdStatus': 5  # Default value
+        }
+        business_details = remove_commas(business_details)
+        scraped_results.append(business_details)
+
+    return scraped_results
+
+
+def parse_page(page_html, original_keyword):
+    """Parse a results page into (rows, last page number); runs in a worker thread"""
+    parser = html.fromstring(page_html)
+    return parse_results(parser, original_keyword), page_count_from_pagination(read_pagination(parser))
+
+
+def write_place_csv(place, rows):
+    # Write all data for the current place (state) into a single file
+    output_file = f"{place}-yellowpages-scraped-data.csv"
+    print(f"Writing data for {place} to {output_file}")
+    with open(output_file, 'w', encoding="utf-8", newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES, quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        for data in rows:
+            writer.writerow(data)
+    return output_file
+
+
+class PlaceScraper:
+    """Concurrent scraper writing one CSV per place.
+
+    Every place, keyword and page shares one pooled aiohttp session and at
+    most `concurrency` requests are in flight. Page 1 of a search gives the
+    page count, then the remaining pages are fetched together. Parsing runs
+    in worker threads, so later pages download while earlier ones parse.
+    Failed requests are retried with jittered exponential backoff that
+    honours Retry-After.
+    """
+
+    def __init__(self, concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.session = None
+        self.semaphore = None
+        self.pages_fetched = 0
+        self.rows_scraped = 0
+        self.retries = 0
+        self.page_latencies = []
+
+    async def fetch(self, url):
+        """GET a page; (status, text), or (None, None) once retries run out"""
+        start_time = time.perf_counter()
+        for attempt in range(self.max_retries):
+            retry_after = None
+            async with self.semaphore:
+                try:
+                    async with self.session.get(url) as response:
+                        if response.status not in RETRY_STATUSES:
+                            # A bad byte should not cost the whole page
+                            text = await response.text(errors='replace')
+                            self.page_latencies.append(time.perf_counter() - start_time)
+                            return response.status, text
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        error = f"HTTP {response.status}"
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = str(e) or type(e).__name__
+
+            # Back off outside the semaphore so other requests keep going
+            if attempt + 1 < self.max_retries:
+                delay = backoff_delay(attempt, retry_after)
+                self.retries += 1
+                print(f"Error occurred: {error}, retrying {url} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        print(f"Giving up on {url} after {self.max_retries} attempts")
+        return None, None
+
+    async def parse_listing(self, original_keyword, encoded_keyword, place, page):
+        """Fetch and parse one results page; (rows, last page number), or None if it failed"""
+        url = f"{BASE_URL}/search?search_terms={encoded_keyword}&geo_location_terms={urllib.parse.quote_plus(place)}&page={page}"
+
+        print("Retrieving", url)
+        status, page_html = await self.fetch(url)
+        self.pages_fetched += 1
+        if status == 200:
+            try:
+                rows, last_page_number = await asyncio.to_thread(parse_page, page_html, original_keyword)
+            except Exception as e:
+                # An empty or mangled body fails only its own page, not the place
+                print(f"Failed to parse {url}: {e}")
+                return None
+            self.rows_scraped += len(rows)
+            return rows, last_page_number
+        elif status == 404:
+            print(f"No results found for {original_keyword} in {place}")
+        elif status is not None:
+            print(f"Failed to process the page: HTTP {status}")
+        return None
+
+    async def scrape_keyword(self, original_keyword, encoded_keyword, place):
+        first_page = await self.parse_listing(original_keyword, encoded_keyword, place, 1)
+        if first_page is None:
+            return []
+        rows, last_page_number = first_page
+        print(f"Scraping {last_page_number} pages for {original_keyword} in {place}")
+
+        later_pages = await asyncio.gather(*(
+            self.parse_listing(original_keyword, encoded_keyword, place, page)
+            for page in range(2, last_page_number + 1)
+        ))
+        for page in later_pages:
+            if page is not None:
+                rows.extend(page[0])
+        return rows
+
+    async def scrape_place(self, keywords, place, place_slots):
+        async with place_slots:
+            per_keyword = await asyncio.gather(*(
+                self.scrape_keyword(original_keyword, encoded_keyword, place)
+                for original_keyword, encoded_keyword in keywords
+            ))
+            all_scraped_data = [row for rows in per_keyword for row in rows]  # Collect all data for this place
+            if all_scraped_data:
+                await asyncio.to_thread(write_place_csv, place, all_scraped_data)
+            return len(all_scraped_data)
+
+    async def run(self, keywords, places):
+        """Scrape every (original, encoded) keyword in every place; returns rows written per place"""
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        # Enough places in flight to keep every request slot busy, without
+        # holding the rows of the whole state in memory at once
+        place_slots = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(connector=connector, headers=headers,
+                                         timeout=aiohttp.ClientTimeout(total=30)) as self.session:
+            counts = await asyncio.gather(*(self.scrape_place(keywords, place, place_slots) for place in places))
+        return dict(zip(places, counts))
 
 
 if __name__ == "__main__":
-    import urllib.parse  # Import for encoding spaces as '+'
-
     argparser = argparse.ArgumentParser()
     argparser.add_argument('keywords_csv_file', help='CSV file with keywords')
     argparser.add_argument('places_csv_file', help='CSV file with places')
+    argparser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY, help='Requests in flight at once')
+    argparser.add_argument('--max-retries', type=int, default=MAX_RETRIES, help='Attempts per page before giving up')
 
     args = argparser.parse_args()
 
@@ -113,30 +234,9 @@ if __name__ == "__main__":
         reader = csv.reader(f)
         places = [row[0] for row in reader]
 
-    for place in places:
-        all_scraped_data = []  # Collect all data for this place
-
-        for original_keyword, encoded_keyword in keywords:
-            url = f"https://www.yellowpages.com/search?search_terms={encoded_keyword}&geo_location_terms={place}"
-            last_page_number = get_last_page_number(url, headers)
-
-            if last_page_number is not None:
-                for page in range(1, last_page_number + 1):
-                    print(f"Scraping page {page} of {last_page_number} for {original_keyword} in {place}")
-                    scraped_data = parse_listing(original_keyword, place, page)
-                    all_scraped_data.extend(scraped_data)
-                    time.sleep(1)
-
-        # Write all data for the current place (state) into a single file
-        if all_scraped_data:
-            output_file = f"{place}-yellowpages-scraped-data.csv"
-            print(f"Writing data for {place} to {output_file}")
-            with open(output_file, 'w', encoding="utf-8", newline='') as csvfile:
-                fieldnames = [
-                    'BusinessName', 'Phone', 'Address', 'Location', 'Industry', 'TimeZone', 'IdStatus'
-                ]
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-                writer.writeheader()
-                for data in all_scraped_data:
-                    writer.writerow(data)
-
+    scraper = PlaceScraper(concurrency=args.concurrency, max_retries=args.max_retries)
+    start_time = time.perf_counter()
+    asyncio.run(scraper.run(keywords, places))
+    elapsed = time.perf_counter() - start_time
+    print(f"Scraped {scraper.rows_scraped} listings from {scraper.pages_fetched} pages in {elapsed:.1f}s "
+          f"({scraper.pages_fetched / max(elapsed, 0.001):.1f} pages/s, {scraper.retries} retries)")
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Local stand-in for www.yellowpages.com search pages.
+
+Serves /search?search_terms=...&geo_location_terms=...&page=N in either the
+'result' layout (the .result / organic-listing markup the browser extraction
+targets) or the 'vcard' layout (the search-results organic / v-card markup
+ScrapMultipleLocations parses), or replays recorded pages from a directory.
+It can add latency, server errors, randomly empty pages and a fake
+Cloudflare "Just a moment..." interstitial that clears itself by setting a
+cf_clearance cookie and reloading, like the real one does for a browser.
+"""
+
+import asyncio
+import html
+import logging
+import os
+import random
+from aiohttp import web
+
+RESULTS_PER_PAGE = 30
+
+CHALLENGE_PAGE = """<!DOCTYPE html>
+<html><head><title>Just a moment...</title>
+<script>window._cf_chl_opt = {cType: 'managed'};</script></head>
+<body><p>Checking your browser before accessing the site.</p>
+<script>
+setTimeout(function () {
+    document.cookie = 'cf_clearance=bench-clearance; path=/';
+    location.reload();
+}, 500);
+</script></body></html>"""
+
+RESULT_LISTING = """
+<div class="result" data-testid="organic-listing">
+  <h2><a class="business-name" href="/biz/{slug}"><span>{name}</span></a></h2>
+  <div class="categories"><a href="/c/1">{category}</a><a href="/c/2">Consultants</a></div>
+  <div class="phone">{phone}</div>
+  <div class="address">{street}, {locality}</div>
+  <a class="website" href="{website}">Website</a>
+</div>"""
+
+VCARD_LISTING = """
+<div class="result" id="lid-{slug}"><div class="srp-listing clickable-area">
+<div class="v-card"><div class="info">
+  <div class="info-section info-primary">
+    <h2 class="n">{index}. <a class="business-name" href="/biz/{slug}"><span>{name}</span></a></h2>
+    <div class="categories"><a href="/c/1">{category}</a><a href="/c/2">Consultants</a></div>
+  </div>
+  <div class="info-section info-secondary">
+    <div class="phones phone primary">{phone}</div>
+    <div class="adr"><div class="street-address">{street}</div><div class="locality">{locality}</div></div>
+    <div class="links"><a class="track-visit-website" href="{website}">Website</a></div>
+  </div>
+</div></div></div></div>"""
+
+PAGE = """<!DOCTYPE html>
+<html><head><title>{keyword} in {place} | Yellow Pages</title>
+<link rel="stylesheet" href="/static/site.css"></head>
+<body>
+<div class="search-results organic">{listings}
+</div>
+{pagination}
+<img src="/static/logo.png"><script src="https://ads.example.com/tag.js"></script>
+</body></html>"""
+
+PAGINATION = """<div class="pagination"><span>Showing {first}-{last} of {total}</span><ul>{links}<li><a class="next">Next</a></li></ul></div>"""
+
+
+class FakeYellowPages:
+    """aiohttp server imitating Yellow Pages search, for offline benchmarks"""
+
+    def __init__(self, layout='vcard', pages=5, latency_ms=0, error_rate=0.0, empty_rate=0.0,
+                 challenge_rate=0.0, recordings=None, seed=0, host='127.0.0.1', port=0):
+        self.layout = layout
+        self.pages = pages
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.empty_rate = empty_rate
+        self.challenge_rate = challenge_rate
+        self.recordings = self._load_recordings(recordings) if recordings else []
+        self.random = random.Random(seed)
+        self.host = host
+        self.port = port
+        self.url = None
+        self.requests = 0
+        self.challenges = 0
+        self.errors = 0
+        self._runner = None
+
+    def _load_recordings(self, directory):
+        recordings = []
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.html'):
+                with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                    recordings.append(f.read())
+        logging.info(f"Loaded {len(recordings)} recorded pages from {directory}")
+        return recordings
+
+    def _listing(self, keyword, place, page_num, index):
+        rng = random.Random(f"{keyword}|{place}|{page_num}|{index}")
+        # Like the real site, one advertiser shows up on every page
+        if index == 0:
+            business, phone, street = f"{keyword} Pros", "(833) 555-0100", "Serving your area."
+        else:
+            business = f"{place} {keyword} {page_num}-{index}"
+            phone = f"({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}"
+            street = f"{rng.randint(1, 9999)} Main St"
+        template = VCARD_LISTING if self.layout == 'vcard' else RESULT_LISTING
+        return template.format(
+            index=index + 1,
+            slug=f"{page_num}-{index}",
+            name=html.escape(business),
+            category=html.escape(keyword),
+            phone=phone,
+            street=street,
+            locality=html.escape(f"{place} 00000"),
+            website=f"http://business-{page_num}-{index}.example.com/",
+        )
+
+    def render(self, keyword, place, page_num, empty=False):
+        if self.recordings and not empty:
+            return self.recordings[(page_num - 1) % len(self.recordings)]
+
+        listings = '' if empty else ''.join(
+            self._listing(keyword, place, page_num, index) for index in range(RESULTS_PER_PAGE)
+        )
+        pagination = ''
+        if not empty:
+            total = self.pages * RESULTS_PER_PAGE
+            window = range(max(1, page_num - 2), min(self.pages, page_num + 2) + 1)
+            pagination = PAGINATION.format(
+                first=(page_num - 1) * RESULTS_PER_PAGE + 1,
+                last=page_num * RESULTS_PER_PAGE,
+                total=total,
+                links=''.join(f'<li><a href="?page={n}">{n}</a></li>' for n in window),
+            )
+        return PAGE.format(
+            keyword=html.escape(keyword),
+            place=html.escape(place),
+            listings=listings,
+            pagination=pagination,
+        )
+
+    async def handle_search(self, request):
+        self.requests += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.random.expovariate(1000 / self.latency_ms))
+
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503, text='Service Unavailable')
+
+        if 'cf_clearance' not in request.cookies and self.random.random() < self.challenge_rate:
+            self.challenges += 1
+            return web.Response(status=403, text=CHALLENGE_PAGE, content_type='text/html',
+                                headers={'cf-mitigated': 'challenge'})
+
+        keyword = request.query.get('search_terms', '')
+        place = request.query.get('geo_location_terms', '')
+        page_num = int(request.query.get('page', 1) or 1)
+        empty = page_num > self.pages or (page_num > 1 and self.random.random() < self.empty_rate)
+        return web.Response(text=self.render(keyword, place, page_num, empty), content_type='text/html')
+
+    async def handle_static(self, request):
+        return web.Response(body=b'\0' * 2048)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/search', self.handle_search)
+        app.router.add_get('/static/{name}', self.handle_static)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{self.host}:{self.port}"
+        logging.info(f"Fake Yellow Pages listening on {self.url} ({self.layout} layout)")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def serve_forever(args):
+    server = FakeYellowPages(
+        layout=args.layout, pages=args.pages, latency_ms=args.latency_ms, error_rate=args.error_rate,
+        empty_rate=args.empty_rate, challenge_rate=args.challenge_rate, recordings=args.recordings,
+        port=args.port
+    )
+    await server.start()
+    print(f"Serving on {server.url}/search - Ctrl+C to stop")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('--layout', choices=['vcard', 'result'], default='vcard')
+    argparser.add_argument('--pages', type=int, default=5, help='Result pages per search')
+    argparser.add_argument('--latency-ms', type=float, default=0, help='Mean added response latency')
+    argparser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    argparser.add_argument('--empty-rate', type=float, default=0.0, help='Share of pages served without listings')
+    argparser.add_argument('--challenge-rate', type=float, default=0.0,
+                           help='Share of requests without cf_clearance that get the interstitial')
+    argparser.add_argument('--recordings', help='Directory of recorded search pages (*.html) to replay')
+    argparser.add_argument('--port', type=int, default=8080)
+    try:
+        asyncio.run(serve_forever(argparser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Micro-benchmark of listing extraction, per results page.
+
+Times the parsers both scrapers share from listing_parser on pages rendered
+by FakeYellowPages (or recorded pages from a directory), without any
+network in the way:
+
+    python benchmarks/parse_benchmark.py
+    python benchmarks/parse_benchmark.py --layout result --rounds 500
+    python benchmarks/parse_benchmark.py --recordings saved_pages/
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lxml import html
+import ScrapMultipleLocations
+from listing_parser import parse_search_results, read_pagination, page_count_from_pagination
+from fake_yellowpages import FakeYellowPages
+from run_benchmark import percentile
+
+
+def multi_session_parse(page_html):
+    listings, tree = parse_search_results(page_html, "O'Brien's Plumbing", "Coeur d'Alene, ID", 'PST')
+    page_count_from_pagination(read_pagination(tree))
+    return len(listings)
+
+
+def place_scraper_parse(page_html):
+    rows, _ = ScrapMultipleLocations.parse_page(page_html, "O'Brien's Plumbing")
+    return len(rows)
+
+
+def tree_only(page_html):
+    html.fromstring(page_html)
+    return 0
+
+
+PARSERS = {
+    'lxml tree only': tree_only,
+    'parse_search_results': multi_session_parse,
+    'ScrapMultipleLocations.parse_page': place_scraper_parse,
+}
+
+
+def time_parser(parse, pages, rounds):
+    timings = []
+    listings = 0
+    for _ in range(rounds):
+        for page_html in pages:
+            start_time = time.perf_counter()
+            listings += parse(page_html)
+            timings.append(time.perf_counter() - start_time)
+    return timings, listings / rounds
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Time listing extraction per results page')
+    argparser.add_argument('--layout', choices=['vcard', 'result'], default='vcard')
+    argparser.add_argument('--recordings', help='Directory of recorded search pages (*.html) to parse instead')
+    argparser.add_argument('--pages', type=int, default=10, help='Distinct pages to render')
+    argparser.add_argument('--rounds', type=int, default=200, help='Times every page is parsed')
+    args = argparser.parse_args()
+
+    server = FakeYellowPages(layout=args.layout, pages=args.pages, recordings=args.recordings)
+    pages = server.recordings or [
+        server.render("O'Brien's Plumbing", "Coeur d'Alene, ID", page_num) for page_num in range(1, args.pages + 1)
+    ]
+    size_kb = sum(len(page_html) for page_html in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size_kb:.0f} KB each on average, {args.rounds} rounds")
+
+    for name, parse in PARSERS.items():
+        parse(pages[0])  # warm up
+        timings, listings = time_parser(parse, pages, args.rounds)
+        print(f"{name:34s} mean {sum(timings) / len(timings) * 1000:.2f} ms, "
+              f"p50 {percentile(timings, 0.5) * 1000:.2f} ms, p95 {percentile(timings, 0.95) * 1000:.2f} ms, "
+              f"{listings / len(pages):.0f} listings/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Offline throughput benchmark for the scrapers.
+
+Starts a FakeYellowPages server on localhost and runs one of the scrapers
+against it end to end, then reports pages/sec, listings/sec, p50/p95 page
+latency, peak RSS of the process tree and peak number of browser processes:
+
+    python benchmarks/run_benchmark.py multi-session --places 5 --pages 4
+    python benchmarks/run_benchmark.py multi-session --engine browser --browser-mode pool
+    python benchmarks/run_benchmark.py place-scraper --latency-ms 200 --concurrency 16
+    python benchmarks/run_benchmark.py multi-session --challenge-rate 0.3 --json report.json
+    python benchmarks/run_benchmark.py multi-session --page-cache /tmp/bench_cache.db --port 8800
+
+Output files (CSV parts, checkpoint) go to a temporary directory.
+"""
+
+import os
+import sys
+import io
+import json
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import contextlib
+from urllib.parse import quote_plus
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ScrapMultipleLocations
+from browser_pool import process_tree_rss_mb
+from browser_supervisor import browser_processes
+from multi_session_scraper import MultiSessionScraper
+from proxy_manager import ProxyManager
+from fake_yellowpages import FakeYellowPages
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ResourceSampler:
+    """Polls process-tree RSS and browser process count while a run is going"""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.peak_browsers = 0
+        self._task = None
+
+    async def _sample(self):
+        while True:
+            self.peak_rss_mb = max(self.peak_rss_mb, process_tree_rss_mb())
+            self.peak_browsers = max(self.peak_browsers, len(browser_processes()))
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def bench_multi_session(server, args, keywords, places):
+    with open('bench.csv', 'w', encoding='utf-8') as f:
+        f.write('\n'.join(places) + '\n')
+
+    scraper = MultiSessionScraper(
+        'bench.csv',
+        engine=args.engine,
+        browser_mode=args.browser_mode,
+        pool_size=args.concurrency,
+        proxy_interval=0,
+        host_interval=0,
+        ready_timeout=args.ready_timeout,
+        base_url=server.url,
+        webhook_url=None,
+        proxy_manager=ProxyManager(refresh_interval=0),
+        direct=True,
+        page_cache_path=args.page_cache,
+    )
+    await scraper.run_multi_session_scraper(keywords, places)
+    return {
+        'pages': scraper.pages_scraped,
+        'listings': scraper.sink.rows_written + scraper.dedup.duplicates,
+        'listings_written': scraper.sink.rows_written,
+        'latencies': scraper.page_latencies,
+    }
+
+
+async def bench_place_scraper(server, args, keywords, places):
+    ScrapMultipleLocations.BASE_URL = server.url
+    scraper = ScrapMultipleLocations.PlaceScraper(concurrency=args.concurrency)
+    await scraper.run([(keyword, quote_plus(keyword)) for keyword in keywords], places)
+    return {
+        'pages': scraper.pages_fetched,
+        'listings': scraper.rows_scraped,
+        'listings_written': scraper.rows_scraped,
+        'latencies': scraper.page_latencies,
+    }
+
+
+TARGETS = {
+    'multi-session': bench_multi_session,
+    'place-scraper': bench_place_scraper,
+}
+
+
+async def run(args):
+    server = FakeYellowPages(
+        layout=args.layout, pages=args.pages, latency_ms=args.latency_ms, error_rate=args.error_rate,
+        empty_rate=args.empty_rate, challenge_rate=args.challenge_rate, recordings=args.recordings,
+        port=args.port
+    )
+    await server.start()
+    keywords = [keyword.strip() for keyword in args.keywords.split(',')]
+    places = [f"City {i}, CA" for i in range(1, args.places + 1)]
+
+    sampler = ResourceSampler()
+    sampler.start()
+    workdir = tempfile.mkdtemp(prefix='lead-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    # The scrapers print progress for every page; keep the report readable
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    start_time = time.perf_counter()
+    try:
+        with output:
+            measured = await TARGETS[args.target](server, args, keywords, places)
+    finally:
+        elapsed = time.perf_counter() - start_time
+        os.chdir(cwd)
+        await sampler.stop()
+        await server.stop()
+
+    latencies = measured['latencies']
+    return {
+        'target': args.target,
+        'engine': args.engine if args.target == 'multi-session' else 'aiohttp',
+        'browser_mode': args.browser_mode if args.target == 'multi-session' else None,
+        'layout': args.layout,
+        'elapsed_s': round(elapsed, 3),
+        'pages': measured['pages'],
+        'listings': measured['listings'],
+        'listings_written': measured['listings_written'],
+        'pages_per_s': round(measured['pages'] / elapsed, 2) if elapsed else 0.0,
+        'listings_per_s': round(measured['listings'] / elapsed, 2) if elapsed else 0.0,
+        'latency_p50_s': round(percentile(latencies, 0.5), 4),
+        'latency_p95_s': round(percentile(latencies, 0.95), 4),
+        'peak_rss_mb': round(sampler.peak_rss_mb, 1),
+        'peak_browser_processes': sampler.peak_browsers,
+        'server_requests': server.requests,
+        'server_challenges': server.challenges,
+        'server_errors': server.errors,
+        'workdir': workdir,
+    }
+
+
+def print_report(report):
+    print(f"\n{'='*60}")
+    print(f"BENCHMARK: {report['target']} ({report['engine']}"
+          f"{', ' + report['browser_mode'] if report['browser_mode'] else ''}, {report['layout']} layout)")
+    print(f"{'='*60}")
+    print(f"Pages: {report['pages']} in {report['elapsed_s']:.2f}s -> {report['pages_per_s']:.2f} pages/s")
+    print(f"Listings: {report['listings']} ({report['listings_written']} after dedup) -> {report['listings_per_s']:.2f} listings/s")
+    print(f"Page latency: p50 {report['latency_p50_s']:.3f}s, p95 {report['latency_p95_s']:.3f}s")
+    print(f"Peak RSS: {report['peak_rss_mb']:.0f} MB, peak browser processes: {report['peak_browser_processes']}")
+    print(f"Server: {report['server_requests']} requests, {report['server_challenges']} challenges, {report['server_errors']} errors")
+    print(f"Output: {report['workdir']}")
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Benchmark the scrapers against a local Yellow Pages stand-in')
+    argparser.add_argument('target', choices=sorted(TARGETS))
+    argparser.add_argument('--keywords', default='Real Estate', help='Comma-separated keywords')
+    argparser.add_argument('--places', type=int, default=3, help='Number of places to search')
+    argparser.add_argument('--pages', type=int, default=5, help='Result pages per search')
+    argparser.add_argument('--layout', choices=['vcard', 'result'], default='vcard')
+    argparser.add_argument('--recordings', help='Directory of recorded search pages (*.html) to replay')
+    argparser.add_argument('--latency-ms', type=float, default=0, help='Mean added server latency')
+    argparser.add_argument('--error-rate', type=float, default=0.0)
+    argparser.add_argument('--empty-rate', type=float, default=0.0)
+    argparser.add_argument('--challenge-rate', type=float, default=0.0)
+    argparser.add_argument('--engine', choices=['hybrid', 'browser'], default='hybrid')
+    argparser.add_argument('--browser-mode', choices=['pool', 'session'], default='pool')
+    argparser.add_argument('--concurrency', type=int, default=5,
+                           help='Browser pool size (multi-session) or requests in flight (place-scraper)')
+    argparser.add_argument('--ready-timeout', type=float, default=5.0)
+    argparser.add_argument('--page-cache', help='Page cache database for multi-session (default: no cache); '
+                                                'run twice with the same path and --port to time a warm rerun')
+    argparser.add_argument('--port', type=int, default=0, help='Port of the fake server (default: any free port)')
+    argparser.add_argument('--json', help='Also write the report to this JSON file')
+    argparser.add_argument('--verbose', action='store_true', help='Keep scraper logging and progress output')
+    args = argparser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
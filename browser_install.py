@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import logging
+import subprocess
+
+# Headless launches use the headless shell on newer Playwright releases
+CHROMIUM_BROWSERS = ('chromium', 'chromium-headless-shell')
+
+
+def playwright_package_dir():
+    """The Node package inside the Playwright wheel, holding browsers.json"""
+    import playwright
+    return os.path.join(os.path.dirname(playwright.__file__), 'driver', 'package')
+
+
+def browsers_dir():
+    """Where Playwright installs browsers, resolved the way Playwright itself does"""
+    configured = os.environ.get('PLAYWRIGHT_BROWSERS_PATH')
+    if configured == '0':
+        return os.path.join(playwright_package_dir(), '.local-browsers')
+    if configured:
+        return configured
+    if sys.platform == 'win32':
+        cache = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    elif sys.platform == 'darwin':
+        cache = os.path.expanduser(os.path.join('~', 'Library', 'Caches'))
+    else:
+        cache = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(cache, 'ms-playwright')
+
+
+def missing_chromium_builds():
+    """Chromium builds this Playwright version needs that are not fully installed on disk.
+
+    Reads the pinned revisions from the package's browsers.json and looks for
+    each `<name>-<revision>` directory and its INSTALLATION_COMPLETE marker,
+    without starting the Playwright driver.
+    """
+    with open(os.path.join(playwright_package_dir(), 'browsers.json'), 'r', encoding='utf-8') as f:
+        pinned = {browser['name']: browser['revision'] for browser in json.load(f)['browsers']}
+    root = browsers_dir()
+    missing = []
+    for name in CHROMIUM_BROWSERS:
+        if name not in pinned:
+            continue
+        build = f"{name.replace('-', '_')}-{pinned[name]}"
+        if not os.path.exists(os.path.join(root, build, 'INSTALLATION_COMPLETE')):
+            missing.append(build)
+    return missing
+
+
+def ensure_chromium(install=True):
+    """True if Chromium is installed, running `playwright install chromium` only when it is not"""
+    try:
+        missing = missing_chromium_builds()
+    except Exception as e:
+        logging.warning(f"Could not check the Playwright browser install: {e}")
+        missing = ['chromium']
+    if not missing:
+        logging.info(f"Playwright Chromium found in {browsers_dir()}")
+        return True
+    logging.warning(f"Playwright browsers missing from {browsers_dir()}: {', '.join(missing)}")
+    if not install:
+        return False
+    try:
+        result = subprocess.run([sys.executable, '-m', 'playwright', 'install', 'chromium'],
+                                capture_output=True, text=True, timeout=300)
+        if result.returncode == 0:
+            logging.info("Playwright browsers installed successfully")
+            return True
+        logging.error(f"Playwright install failed: {result.stderr.strip()}")
+    except Exception as e:
+        logging.error(f"Failed to install Playwright browsers: {e}")
+    return False
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from playwright.async_api import async_playwright
+from contextlib import asynccontextmanager
+import asyncio
+import time
+import logging
+import psutil
+from metrics import Metrics
+
+LAUNCH_ARGS = [
+    '--no-first-run',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-web-security',
+    '--disable-dev-shm-usage',
+    '--no-sandbox'
+]
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+VIEWPORT = {'width': 1920, 'height': 1080}
+
+STEALTH_SCRIPT = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined});"
+
+
+def process_tree_rss_mb():
+    """Resident memory of this process plus all its children (Chromium included), in MB"""
+    process = psutil.Process()
+    total = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+
+async def open_context(browser, clearance=None):
+    """New stealth context, carrying a proxy's Cloudflare clearance and its user agent if given"""
+    context = await browser.new_context(viewport=VIEWPORT, user_agent=clearance.user_agent if clearance else USER_AGENT)
+    await context.add_init_script(STEALTH_SCRIPT)
+    if clearance is not None:
+        await context.add_cookies(clearance.cookies)
+    return context
+
+
+class PooledBrowser:
+    """A long-lived Chromium bound to one proxy, serving one page at a time"""
+
+    def __init__(self, slot_id, browser, proxy):
+        self.slot_id = slot_id
+        self.browser = browser
+        self.proxy = proxy
+        self.supervised = None
+        self.context = None
+        self.context_pages = 0
+        self.pages_served = 0
+        self.recycle_context = False
+
+    @property
+    def proxy_id(self):
+        return self.proxy['id'] if self.proxy else 'direct'
+
+
+class BrowserPool:
+    """Pool of N browsers that hand out fresh pages from recycled contexts.
+
+    Each browser keeps one BrowserContext alive for `pages_per_context` pages,
+    or until the caller flags it with `recycle_context` (e.g. after a
+    Cloudflare failure), so cookies never leak between sessions for long but
+    the Chromium process spawn is paid only once per browser. When a
+    browser's proxy is put on cooldown by the ProxyManager, the browser is
+    relaunched on a healthier proxy at its next context recycle. New
+    contexts start with the clearance their proxy holds in `clearances`.
+    With a BrowserSupervisor, every browser is registered with it and
+    replaced before its next page once the supervisor wants it retired
+    (page count, memory cap, or killed while hung).
+    """
+
+    def __init__(self, proxy_manager, size=5, pages_per_context=10, headless=True, metrics=None, clearances=None,
+                 supervisor=None):
+        self.proxy_manager = proxy_manager
+        self.clearances = clearances
+        self.supervisor = supervisor
+        self.metrics = metrics or Metrics()
+        self.size = size
+        self.pages_per_context = pages_per_context
+        self.headless = headless
+        self.playwright = None
+        self.browsers = []
+        self._idle = asyncio.Queue()
+
+    def _pick_proxies(self):
+        picked = self.proxy_manager.pick_many(self.size) if self.proxy_manager else []
+        if not picked:
+            return [None] * self.size
+        return [picked[i % len(picked)] for i in range(self.size)]
+
+    async def _launch(self, proxy):
+        with self.metrics.timer('browser_launch'):
+            return await self.playwright.chromium.launch(
+                headless=self.headless,
+                args=LAUNCH_ARGS,
+                proxy=proxy
+            )
+
+    async def _supervise(self, slot):
+        if self.supervisor:
+            slot.supervised = await self.supervisor.register(slot.browser, f"Browser #{slot.slot_id}")
+
+    async def _close_browser(self, slot):
+        try:
+            await slot.browser.close()
+        except Exception as e:
+            logging.warning(f"Browser #{slot.slot_id}: error closing browser: {e}")
+        if slot.supervised:
+            await self.supervisor.unregister(slot.supervised)
+            slot.supervised = None
+
+    async def _relaunch(self, slot):
+        await self._close_browser(slot)
+        slot.browser = await self._launch(slot.proxy)
+        await self._supervise(slot)
+
+    async def start(self):
+        """Launch all browsers in parallel"""
+        start_time = time.perf_counter()
+        self.playwright = await async_playwright().start()
+
+        proxies = self._pick_proxies()
+        launched = await asyncio.gather(*(self._launch(proxy) for proxy in proxies), return_exceptions=True)
+
+        for slot_id, (browser, proxy) in enumerate(zip(launched, proxies)):
+            if isinstance(browser, Exception):
+                logging.error(f"Browser #{slot_id} failed to launch via {proxy['id'] if proxy else 'direct'}: {browser}")
+                continue
+            slot = PooledBrowser(slot_id, browser, proxy)
+            await self._supervise(slot)
+            self.browsers.append(slot)
+            self._idle.put_nowait(slot)
+
+        if not self.browsers:
+            raise RuntimeError("Browser pool could not launch any browser")
+
+        elapsed = time.perf_counter() - start_time
+        logging.info(f"Browser pool started: {len(self.browsers)} browsers in {elapsed:.1f}s, RSS {process_tree_rss_mb():.0f} MB")
+
+    async def _close_context(self, slot):
+        if slot.context is not None:
+            try:
+                await slot.context.close()
+            except Exception as e:
+                logging.warning(f"Browser #{slot.slot_id}: error closing context: {e}")
+        slot.context = None
+        slot.context_pages = 0
+
+    async def _rebind(self, slot):
+        """Move a browser whose proxy is cooling down onto a healthy proxy"""
+        in_use = {other.proxy_id for other in self.browsers if other is not slot}
+        proxy = self.proxy_manager.pick(exclude=in_use)
+        if proxy is None or proxy['id'] == slot.proxy_id:
+            return
+        logging.info(f"Browser #{slot.slot_id}: proxy {slot.proxy_id} cooling down, relaunching via {proxy['id']}")
+        slot.proxy = proxy
+        await self._relaunch(slot)
+
+    async def _new_context(self, slot):
+        await self._close_context(slot)
+
+        if slot.proxy and self.proxy_manager and not self.proxy_manager.is_available(slot.proxy_id):
+            await self._rebind(slot)
+
+        if not slot.browser.is_connected():
+            logging.warning(f"Browser #{slot.slot_id} disconnected, relaunching")
+            await self._relaunch(slot)
+
+        start_time = time.perf_counter()
+        clearance = self.clearances.seed(slot.proxy_id) if self.clearances else None
+        with self.metrics.timer('context_create'):
+            slot.context = await open_context(slot.browser, clearance)
+        slot.recycle_context = False
+        logging.debug(f"Browser #{slot.slot_id}: new context in {time.perf_counter() - start_time:.2f}s")
+
+    @asynccontextmanager
+    async def page(self):
+        """Lease an idle browser and yield a fresh page plus its PooledBrowser"""
+        slot = await self._idle.get()
+        try:
+            if slot.supervised and self.supervisor.should_retire(slot.supervised):
+                self.supervisor.retiring(slot.supervised)
+                await self._close_context(slot)
+                await self._relaunch(slot)
+
+            if slot.context is None or slot.recycle_context or slot.context_pages >= self.pages_per_context:
+                await self._new_context(slot)
+
+            page = await slot.context.new_page()
+            slot.context_pages += 1
+            slot.pages_served += 1
+            if slot.supervised:
+                self.supervisor.page_started(slot.supervised)
+            try:
+                yield page, slot
+            finally:
+                if slot.supervised:
+                    self.supervisor.page_finished(slot.supervised)
+                try:
+                    await page.close()
+                except Exception:
+                    slot.recycle_context = True
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def close(self):
+        for slot in self.browsers:
+            await self._close_context(slot)
+            await self._close_browser(slot)
+        self.browsers = []
+
+        if self.playwright:
+            await self.playwright.stop()
+            self.playwright = None
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import time
+import logging
+import psutil
+from metrics import Metrics
+
+BROWSER_PROCESS_NAMES = ('chrome', 'chromium', 'headless_shell')
+
+# Browser processes younger than this may belong to a launch still being registered
+ORPHAN_GRACE = 60.0
+
+
+def is_browser_process(process):
+    try:
+        return any(name in process.name().lower() for name in BROWSER_PROCESS_NAMES)
+    except psutil.Error:
+        return False
+
+
+def browser_processes():
+    """Chromium processes (browsers, renderers, helpers) descended from this process"""
+    return [child for child in psutil.Process().children(recursive=True) if is_browser_process(child)]
+
+
+def process_tree(pid):
+    """A process and all its descendants, or [] if it is gone"""
+    try:
+        process = psutil.Process(pid)
+        return [process] + process.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+def kill_processes(processes):
+    """Kill processes and wait for them to go; returns how many were still alive"""
+    alive = []
+    for process in processes:
+        try:
+            process.kill()
+            alive.append(process)
+        except psutil.Error:
+            pass
+    psutil.wait_procs(alive, timeout=5)
+    return len(alive)
+
+
+class SupervisedBrowser:
+    """One launched browser as the supervisor sees it"""
+
+    def __init__(self, browser, label, pid):
+        self.browser = browser
+        self.label = label
+        self.pid = pid
+        self.launched_at = time.monotonic()
+        self.pages = 0
+        self.busy_since = None
+        self.retire_reason = None
+
+    def rss_mb(self):
+        total = 0
+        for process in process_tree(self.pid) if self.pid else []:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+
+class BrowserSupervisor:
+    """Tracks every Chromium this process launches and keeps their memory bounded.
+
+    Each browser is registered right after launch with the PID of its
+    browser process, asked of Chromium itself over CDP, so its renderers
+    are simply that process's descendants. A watchdog task then, every
+    `check_interval` seconds:
+
+    - kills the process tree of a browser busy on one page for longer than
+      `page_deadline` seconds, so the hung call fails and the browser is
+      replaced by its owner;
+    - marks browsers past `max_rss_mb` for retirement; owners check
+      `should_retire` between pages, which also enforces `max_pages`;
+    - kills Chromium processes that belong to no registered browser (left
+      behind by a close that failed or a crashed launch) and reports them
+      as leaks.
+
+    Unregistering a browser after closing it also kills and reports
+    whatever is left of its process tree.
+    """
+
+    def __init__(self, max_rss_mb=1024, max_pages=200, page_deadline=180, check_interval=10, metrics=None):
+        self.max_rss_mb = max_rss_mb
+        self.max_pages = max_pages
+        self.page_deadline = page_deadline
+        self.check_interval = check_interval
+        self.metrics = metrics or Metrics()
+        self.browsers = []
+        self.launched = 0
+        self.retired = {}
+        self.hung_killed = 0
+        self.leaked_processes = 0
+        self.peak_rss_mb = 0.0
+        self._untracked = False
+        self._task = None
+
+    async def register(self, browser, label):
+        """Start supervising a freshly launched browser"""
+        pid = None
+        try:
+            cdp = await browser.new_browser_cdp_session()
+            info = await cdp.send('SystemInfo.getProcessInfo')
+            await cdp.detach()
+            pid = next((process['id'] for process in info['processInfo'] if process['type'] == 'browser'), None)
+        except Exception as e:
+            logging.debug(f"{label}: could not read browser PID: {e}")
+        if pid is None and not self._untracked:
+            # Without PIDs, live processes could pass for leaks: stop sweeping for orphans
+            logging.warning(f"{label}: browser PID unknown, leak sweeping disabled")
+            self._untracked = True
+        supervised = SupervisedBrowser(browser, label, pid)
+        self.browsers.append(supervised)
+        self.launched += 1
+        self.metrics.inc('browsers_launched_total')
+        return supervised
+
+    async def unregister(self, supervised):
+        """Forget a browser its owner closed; anything it left running is killed as a leak"""
+        if supervised in self.browsers:
+            self.browsers.remove(supervised)
+        if supervised.pid:
+            leftovers = await asyncio.to_thread(process_tree, supervised.pid)
+            if leftovers:
+                await self._report_leak(leftovers, f"{supervised.label} after close")
+
+    def page_started(self, supervised):
+        supervised.pages += 1
+        supervised.busy_since = time.monotonic()
+
+    def page_finished(self, supervised):
+        supervised.busy_since = None
+
+    def should_retire(self, supervised):
+        """Reason to replace this browser before its next page, or None"""
+        if supervised.retire_reason is None and supervised.pages >= self.max_pages:
+            supervised.retire_reason = 'pages'
+        return supervised.retire_reason
+
+    def retiring(self, supervised):
+        """Count a browser its owner is replacing because `should_retire` said so"""
+        reason = supervised.retire_reason or 'pages'
+        self.retired[reason] = self.retired.get(reason, 0) + 1
+        self.metrics.inc('browsers_retired_total', reason=reason)
+        logging.info(f"{supervised.label}: retiring after {supervised.pages} pages ({reason})")
+
+    async def _report_leak(self, processes, origin):
+        killed = await asyncio.to_thread(kill_processes, processes)
+        if killed:
+            self.leaked_processes += killed
+            self.metrics.inc('leaked_processes_total', killed)
+            logging.warning(f"Killed {killed} leaked browser processes ({origin})")
+
+    async def check(self):
+        """One watchdog pass: hung pages, memory caps and orphaned processes"""
+        now = time.monotonic()
+        total_rss = 0.0
+        for supervised in list(self.browsers):
+            if supervised.busy_since is not None and now - supervised.busy_since > self.page_deadline:
+                logging.error(f"{supervised.label}: page busy for {now - supervised.busy_since:.0f}s, killing the browser")
+                self.hung_killed += 1
+                self.metrics.inc('browsers_killed_total')
+                supervised.retire_reason = 'hung'
+                supervised.busy_since = None
+                await asyncio.to_thread(kill_processes, process_tree(supervised.pid) if supervised.pid else [])
+                continue
+            rss = await asyncio.to_thread(supervised.rss_mb)
+            total_rss += rss
+            if rss > self.max_rss_mb and supervised.retire_reason is None:
+                logging.warning(f"{supervised.label}: {rss:.0f} MB over the {self.max_rss_mb} MB cap, retiring it")
+                supervised.retire_reason = 'memory'
+        self.peak_rss_mb = max(self.peak_rss_mb, total_rss)
+
+        if not self._untracked:
+            await self._sweep_orphans(ORPHAN_GRACE)
+
+    async def _sweep_orphans(self, grace):
+        def find_orphans():
+            tracked = set()
+            for supervised in self.browsers:
+                tracked.update(process.pid for process in process_tree(supervised.pid))
+            now = time.time()
+            orphans = []
+            for process in browser_processes():
+                try:
+                    if process.pid not in tracked and now - process.create_time() > grace:
+                        orphans.append(process)
+                except psutil.Error:
+                    pass
+            return orphans
+
+        orphans = await asyncio.to_thread(find_orphans)
+        if orphans:
+            await self._report_leak(orphans, 'no registered browser')
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logging.error(f"Browser watchdog error: {e}")
+
+    def start(self):
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        """Stop watching; every browser should be closed by now, so whatever is left leaked"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.browsers = []
+        await self._sweep_orphans(0)
+        logging.info(f"Browser supervisor: {self.summary()}")
+
+    def summary(self):
+        retired = ', '.join(f"{count} for {reason}" for reason, count in sorted(self.retired.items())) or 'none'
+        return (
+            f"{self.launched} browsers launched, retired {retired}, {self.hung_killed} hung browsers killed, "
+            f"{self.leaked_processes} leaked processes killed, peak browser RSS {self.peak_rss_mb:.0f} MB"
+        )
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sqlite3
+import logging
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    keyword TEXT NOT NULL,
+    place TEXT NOT NULL,
+    last_page INTEGER,
+    PRIMARY KEY (keyword, place)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    keyword TEXT NOT NULL,
+    place TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    listings INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (keyword, place, page)
+);
+"""
+
+
+class CheckpointStore:
+    """SQLite record of every (keyword, place, page) job of a run.
+
+    Stores each job's status ('ok', 'empty' or 'failed'), listing count and
+    last error, plus the page count found for each search, so a resumed run
+    only has to redo the pages that did not succeed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def reset(self):
+        """Forget every job, for a run that starts from scratch"""
+        with self.conn:
+            self.conn.execute('DELETE FROM jobs')
+            self.conn.execute('DELETE FROM searches')
+
+    def record_pages(self, results):
+        """Upsert the outcome of a batch of page result dicts in one transaction"""
+        if not results:
+            return
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO jobs (keyword, place, page, status, listings, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (keyword, place, page) DO UPDATE SET
+                    status = excluded.status,
+                    listings = excluded.listings,
+                    error = excluded.error,
+                    attempts = attempts + 1,
+                    updated_at = excluded.updated_at
+                """,
+                [(r['keyword'], r['place'], r['page'], r['status'], len(r['listings']), r['error'], now) for r in results]
+            )
+            self.conn.executemany(
+                """
+                INSERT INTO searches (keyword, place, last_page) VALUES (?, ?, ?)
+                ON CONFLICT (keyword, place) DO UPDATE SET last_page = excluded.last_page
+                """,
+                [(r['keyword'], r['place'], r['last_page']) for r in results if r['last_page']]
+            )
+
+    def search_state(self, keyword, place):
+        """(last_page, pages already done) for a search; last_page is None if unknown"""
+        row = self.conn.execute(
+            'SELECT last_page FROM searches WHERE keyword = ? AND place = ?', (keyword, place)
+        ).fetchone()
+        done_pages = {
+            page for (page,) in self.conn.execute(
+                "SELECT page FROM jobs WHERE keyword = ? AND place = ? AND status = 'ok'", (keyword, place)
+            )
+        }
+        return (row[0] if row else None), done_pages
+
+    def summary(self):
+        """Job counts by status"""
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception as e:
+            logging.warning(f"Error closing checkpoint {self.path}: {e}")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+
+# Cloudflare's default challenge passage lasts 30 minutes, whatever the cookie claims
+DEFAULT_MAX_AGE = 30 * 60
+
+
+class Clearance:
+    """Clearance cookies of one proxy and the user agent they were earned with"""
+
+    def __init__(self, cookies, user_agent, expires_at):
+        self.cookies = cookies
+        self.user_agent = user_agent
+        self.expires_at = expires_at
+
+
+class ClearanceStore:
+    """Cloudflare clearance earned per proxy, shared by every browser context and HTTP session.
+
+    A `cf_clearance` cookie is only honoured for the IP and user agent that
+    solved the challenge, so entries are keyed by proxy and keep the user
+    agent next to the cookies (Playwright format). An entry lives until its
+    cf_clearance cookie expires or `max_age` seconds pass, whichever comes
+    first, and is dropped as soon as the proxy is challenged again.
+    """
+
+    def __init__(self, max_age=DEFAULT_MAX_AGE):
+        self.max_age = max_age
+        self.stored = 0
+        self.reused = 0
+        self.invalidated = 0
+        self._entries = {}
+
+    def record(self, proxy_id, cookies, user_agent):
+        """Keep a proxy's cookies if they include a clearance; True if they did.
+
+        Contexts seeded from the store hand the same cf_clearance back after
+        every page: that keeps the entry as it is, so `max_age` still counts
+        from when the challenge was solved.
+        """
+        clearance = next((cookie for cookie in cookies if cookie['name'] == 'cf_clearance'), None)
+        if clearance is None:
+            return False
+        current = self.get(proxy_id)
+        if current is not None and current.user_agent == user_agent and any(
+            cookie['name'] == 'cf_clearance' and cookie['value'] == clearance['value'] for cookie in current.cookies
+        ):
+            return True
+        expires_at = time.time() + self.max_age
+        if clearance.get('expires', -1) > 0:
+            expires_at = min(expires_at, clearance['expires'])
+        if proxy_id not in self._entries:
+            logging.info(f"Cloudflare clearance stored for {proxy_id}")
+        self._entries[proxy_id] = Clearance(list(cookies), user_agent, expires_at)
+        self.stored += 1
+        return True
+
+    def get(self, proxy_id):
+        """The proxy's unexpired Clearance, or None"""
+        entry = self._entries.get(proxy_id)
+        if entry is not None and entry.expires_at <= time.time():
+            del self._entries[proxy_id]
+            entry = None
+        return entry
+
+    def seed(self, proxy_id):
+        """Like `get`, counting the entry as reused by a new session"""
+        entry = self.get(proxy_id)
+        if entry is not None:
+            self.reused += 1
+        return entry
+
+    def invalidate(self, proxy_id):
+        if self._entries.pop(proxy_id, None) is not None:
+            self.invalidated += 1
+            logging.info(f"Cloudflare clearance for {proxy_id} invalidated by a new challenge")
+
+    def proxy_ids(self):
+        """Proxies currently holding an unexpired clearance"""
+        now = time.time()
+        return {proxy_id for proxy_id, entry in self._entries.items() if entry.expires_at > now}
+
+    def summary(self):
+        return (
+            f"{len(self.proxy_ids())} proxies cleared, {self.stored} clearances stored, "
+            f"{self.reused} reused by new sessions, {self.invalidated} invalidated"
+        )
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import statistics
+from collections import deque
+from contextlib import asynccontextmanager
+import psutil
+from metrics import Metrics
+
+
+class ConcurrencyController:
+    """AIMD limit on the pages in flight, between a floor and a ceiling.
+
+    Outcomes ('ok', 'challenge' or 'failed') and latencies of requests are
+    fed in with `record`. Once a window of as many requests as the current
+    limit has come back, the limit is cut by `backoff` if the share of
+    challenges and failures went over `max_failure_rate`, or if host memory
+    use is above `max_memory_percent`; otherwise it grows by one while the
+    window's median latency stays within `latency_tolerance` times the best
+    median seen (the baseline slowly drifts up so a site that got slower
+    for good does not pin the limit). Slots are handed out by `slot()`.
+    """
+
+    def __init__(self, initial=5, floor=1, ceiling=20, backoff=0.5, max_failure_rate=0.1, latency_tolerance=2.0,
+                 max_memory_percent=85.0, metrics=None):
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.limit = min(max(initial, self.floor), self.ceiling)
+        self.backoff = backoff
+        self.max_failure_rate = max_failure_rate
+        self.latency_tolerance = latency_tolerance
+        self.max_memory_percent = max_memory_percent
+        self.metrics = metrics or Metrics()
+        self.in_flight = 0
+        self.increases = 0
+        self.decreases = 0
+        self.peak_limit = self.limit
+        self.baseline_latency = None
+        self._window = []
+        self._waiters = deque()
+
+    def _wake(self):
+        free = self.limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def acquire(self):
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    # Woken just as it was cancelled: pass the turn on
+                    self._wake()
+                raise
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def memory_pressure(self):
+        return psutil.virtual_memory().percent > self.max_memory_percent
+
+    def _set_limit(self, limit, reason):
+        limit = min(max(limit, self.floor), self.ceiling)
+        if limit == self.limit:
+            return
+        direction = 'up' if limit > self.limit else 'down'
+        logging.info(f"Concurrency {self.limit} -> {limit} ({reason})")
+        self.metrics.inc('concurrency_changes_total', direction=direction)
+        if direction == 'up':
+            self.increases += 1
+        else:
+            self.decreases += 1
+        self.limit = limit
+        self.peak_limit = max(self.peak_limit, limit)
+        self._wake()
+
+    def record(self, outcome, latency):
+        """Feed back one request; adjusts the limit at the end of each window"""
+        self._window.append((outcome, latency))
+        if len(self._window) < self.limit:
+            return
+        window, self._window = self._window, []
+
+        failures = sum(1 for outcome, _ in window if outcome != 'ok')
+        failure_rate = failures / len(window)
+        if failure_rate > self.max_failure_rate:
+            self._set_limit(int(self.limit * self.backoff), f"{failure_rate:.0%} challenges or failures")
+            return
+        if self.memory_pressure():
+            self._set_limit(int(self.limit * self.backoff), f"host memory above {self.max_memory_percent:.0f}%")
+            return
+
+        median = statistics.median(latency for outcome, latency in window if outcome == 'ok')
+        if self.baseline_latency is None or median < self.baseline_latency:
+            self.baseline_latency = median
+        else:
+            self.baseline_latency *= 1.05
+        if median <= self.baseline_latency * self.latency_tolerance:
+            self._set_limit(self.limit + 1, f"median latency {median:.2f}s")
+
+    def summary(self):
+        return (
+            f"limit {self.limit} (floor {self.floor}, ceiling {self.ceiling}, peak {self.peak_limit}), "
+            f"{self.increases} increases, {self.decreases} decreases"
+        )
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import hashlib
+import logging
+from array import array
+
+NON_DIGITS = re.compile(r'\D')
+NAME_NOISE = re.compile(r'[^a-z0-9 ]+')
+NAME_STOPWORDS = {'the', 'and', 'llc', 'inc', 'co', 'corp', 'company', 'ltd'}
+
+
+def normalize_phone(phone):
+    """10-digit US number without punctuation or leading country code"""
+    digits = NON_DIGITS.sub('', phone or '')
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    return digits[:10]
+
+
+def name_fingerprint(name):
+    """Order- and punctuation-insensitive form of a business name"""
+    words = NAME_NOISE.sub(' ', (name or '').lower()).split()
+    return ' '.join(sorted({word for word in words if word not in NAME_STOPWORDS}))
+
+
+def listing_key(listing):
+    """Stable 64-bit key for a listing: normalized phone plus name fingerprint.
+
+    Listings without a phone fall back to their address, so two different
+    phoneless businesses with the same name are not merged.
+    """
+    phone = normalize_phone(listing.get('Phone'))
+    second = phone or (listing.get('Address') or '').strip().lower()
+    raw = f"{second}|{name_fingerprint(listing.get('Name'))}".encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'little')
+
+
+class DedupIndex:
+    """Bounded-memory index of listings already emitted.
+
+    Keys are 64-bit hashes held in a set, with a ring buffer remembering the
+    insertion order: once `max_entries` keys are held the oldest one is
+    forgotten, so memory stays fixed (~70 bytes per entry) however long the
+    run is, and every check is O(1). With `path`, the index is loaded at
+    start and saved by `save()` so repeats are caught across runs.
+    """
+
+    def __init__(self, max_entries=1_000_000, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.duplicates = 0
+        self._keys = set()
+        self._ring = array('Q')
+        self._next = 0
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, listing):
+        """Remember a listing; returns False if it was already seen"""
+        key = listing_key(listing)
+        if key in self._keys:
+            self.duplicates += 1
+            return False
+
+        if len(self._ring) < self.max_entries:
+            self._ring.append(key)
+        else:
+            self._keys.discard(self._ring[self._next])
+            self._ring[self._next] = key
+            self._next = (self._next + 1) % self.max_entries
+        self._keys.add(key)
+        return True
+
+    def filter(self, listings):
+        """The listings not seen before, in order"""
+        return [listing for listing in listings if self.add(listing)]
+
+    def _load(self):
+        ring = array('Q')
+        with open(self.path, 'rb') as f:
+            ring.frombytes(f.read())
+        # Keep only the newest keys if the file holds more than we may
+        for key in ring[-self.max_entries:]:
+            self._ring.append(key)
+        self._keys = set(self._ring)
+        logging.info(f"Loaded {len(self._keys)} dedup keys from {self.path}")
+
+    def save(self):
+        if not self.path:
+            return
+        # Write oldest first so a later load keeps the newest keys
+        ordered = self._ring[self._next:] + self._ring[:self._next]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            ordered.tofile(f)
+        os.replace(tmp_path, self.path)
+        logging.info(f"Saved {len(ordered)} dedup keys to {self.path}")
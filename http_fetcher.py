@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import aiohttp
+from http.cookies import Morsel
+from yarl import URL
+from listing_parser import is_challenge_page
+from clearance_store import ClearanceStore
+
+HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+
+class CloudflareChallenge(Exception):
+    """Raised when a plain HTTP request gets Cloudflare's challenge page"""
+
+
+def clearance_morsel(cookie):
+    """A Playwright-format cookie as a Morsel that keeps its domain and path.
+
+    Handing aiohttp a bare name and value would make it a host-only cookie
+    for the bare domain, never sent to www.yellowpages.com.
+    """
+    morsel = Morsel()
+    morsel.set(cookie['name'], cookie['value'], cookie['value'])
+    morsel['domain'] = cookie['domain']
+    morsel['path'] = cookie.get('path') or '/'
+    if cookie.get('secure'):
+        morsel['secure'] = True
+    return morsel
+
+
+class HttpFetcher:
+    """Plain-HTTP page fetcher with one keep-alive connection pool per proxy.
+
+    Each proxy gets its own aiohttp session, so its connections and cookies
+    are reused across requests. Clearance a browser earned through the same
+    proxy is picked up from the shared ClearanceStore before each request,
+    cookies and user agent both, letting requests on that proxy skip the
+    browser; a challenge invalidates the proxy's clearance in the store.
+    """
+
+    def __init__(self, user_agent, connections_per_proxy=4, timeout=30, clearances=None):
+        self.user_agent = user_agent
+        self.connections_per_proxy = connections_per_proxy
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.clearances = clearances or ClearanceStore()
+        self._sessions = {}
+        # Clearance entry each session's cookie jar was last seeded from
+        self._seeded = {}
+
+    def _session(self, proxy_id):
+        session = self._sessions.get(proxy_id)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections_per_proxy, keepalive_timeout=60, ttl_dns_cache=300),
+                timeout=self.timeout,
+                headers={**HEADERS, 'User-Agent': self.user_agent},
+                # unsafe: also keep cookies for IP hosts, such as the benchmark's local stand-in
+                cookie_jar=aiohttp.CookieJar(unsafe=True)
+            )
+            self._sessions[proxy_id] = session
+            self._seeded.pop(proxy_id, None)
+        return session
+
+    def _apply_clearance(self, proxy_id, session):
+        """Bring a session's cookies in line with the proxy's current clearance; returns it"""
+        clearance = self.clearances.get(proxy_id)
+        if clearance is self._seeded.get(proxy_id):
+            return clearance
+        session.cookie_jar.clear()
+        if clearance is not None:
+            # Cookies are in Playwright format, as stored from a cleared browser
+            for cookie in clearance.cookies:
+                domain = cookie['domain'].lstrip('.')
+                session.cookie_jar.update_cookies({cookie['name']: clearance_morsel(cookie)},
+                                                  response_url=URL(f"https://{domain}/"))
+        self._seeded[proxy_id] = clearance
+        return clearance
+
+    async def fetch(self, url, proxy=None):
+        """GET a page and return (status, html); raises CloudflareChallenge on the interstitial"""
+        proxy_id = proxy['id'] if proxy else 'direct'
+        session = self._session(proxy_id)
+        clearance = self._apply_clearance(proxy_id, session)
+        # cf_clearance only holds for the user agent that earned it
+        headers = {'User-Agent': clearance.user_agent} if clearance else None
+        async with session.get(url, proxy=proxy['server'] if proxy else None, headers=headers) as response:
+            text = await response.text(errors='replace')
+            if response.headers.get('cf-mitigated') == 'challenge' or is_challenge_page(text):
+                self.clearances.invalidate(proxy_id)
+                raise CloudflareChallenge(f"Cloudflare challenge on {url} via {proxy_id}")
+            return response.status, text
+
+    async def close(self):
+        sessions = list(self._sessions.values())
+        self._sessions = {}
+        self._seeded = {}
+        await asyncio.gather(*(session.close() for session in sessions if not session.closed), return_exceptions=True)
+        logging.debug(f"Closed {len(sessions)} HTTP sessions")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from dedup import listing_key
+
+# Fields whose change makes a known lead worth sending again
+TRACKED_FIELDS = ('Name', 'Phone', 'Address', 'Website', 'Category')
+DELTA_FIELDS = ['ChangeType', 'ChangedFields']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    key INTEGER PRIMARY KEY,
+    keyword TEXT NOT NULL,
+    place TEXT NOT NULL,
+    fingerprint INTEGER NOT NULL,
+    row TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    removed_at REAL
+);
+CREATE INDEX IF NOT EXISTS leads_search ON leads (keyword, place);
+"""
+
+
+def _signed(value):
+    """SQLite integers are signed 64-bit"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def lead_fingerprint(listing):
+    raw = '\x1f'.join(str(listing.get(field) or '').strip() for field in TRACKED_FIELDS).encode('utf-8')
+    return _signed(int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'little'))
+
+
+class LeadStore:
+    """SQLite store of every lead seen by earlier runs, for delta output.
+
+    Leads are keyed by dedup.listing_key (normalized phone plus name
+    fingerprint) and remember a hash of their TRACKED_FIELDS. `diff` turns a
+    page of listings into only the new leads and the ones whose fields
+    changed, tagged with ChangeType and ChangedFields. `removed` returns the
+    leads of a search that were not seen since `started_at`. Runs that
+    share the file (sharded workers) should share `started_at` too.
+    """
+
+    def __init__(self, path, started_at=None):
+        self.path = path
+        self.started_at = started_at or time.time()
+        self.counts = {'new': 0, 'changed': 0, 'unchanged': 0, 'removed': 0}
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA busy_timeout=10000')
+        self.conn.executescript(SCHEMA)
+        known = self.conn.execute('SELECT COUNT(*) FROM leads WHERE removed_at IS NULL').fetchone()[0]
+        logging.info(f"Lead store {path}: {known} known leads")
+
+    def diff(self, listings, keyword, place):
+        """The new or changed listings of a search page; records every listing as seen"""
+        if not listings:
+            return []
+        keyed = [(_signed(listing_key(listing)), listing) for listing in listings]
+        placeholders = ','.join('?' * len(keyed))
+        known = {
+            key: (fingerprint, row, last_seen, removed_at)
+            for key, fingerprint, row, last_seen, removed_at in self.conn.execute(
+                f'SELECT key, fingerprint, row, last_seen, removed_at FROM leads WHERE key IN ({placeholders})',
+                [key for key, _ in keyed]
+            )
+        }
+
+        now = time.time()
+        delta = []
+        upserts = []
+        seen_again = []
+        for key, listing in keyed:
+            previous = known.get(key)
+            if previous is not None and previous[2] >= self.started_at and previous[3] is None:
+                # Already handled this run: a repeat ("serving your area" ads
+                # on every page) keeps the first sighting's fields, so leads
+                # listed with varying details do not flap between runs
+                self.counts['unchanged'] += 1
+                seen_again.append((now, key))
+                continue
+            fingerprint = lead_fingerprint(listing)
+            if previous is None or previous[3] is not None:
+                change, changed_fields = 'new', ''
+            elif previous[0] != fingerprint:
+                old = json.loads(previous[1])
+                change = 'changed'
+                changed_fields = ';'.join(field for field in TRACKED_FIELDS if old.get(field) != listing.get(field))
+            else:
+                change = 'unchanged'
+            self.counts[change] += 1
+            if change != 'unchanged':
+                delta.append({**listing, 'ChangeType': change, 'ChangedFields': changed_fields})
+            row = json.dumps(listing)
+            known[key] = (fingerprint, row, now, None)
+            upserts.append((key, keyword, place, fingerprint, row, now, now))
+
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO leads (key, keyword, place, fingerprint, row, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    keyword = excluded.keyword,
+                    place = excluded.place,
+                    fingerprint = excluded.fingerprint,
+                    row = excluded.row,
+                    last_seen = excluded.last_seen,
+                    removed_at = NULL
+                """,
+                upserts
+            )
+            self.conn.executemany('UPDATE leads SET last_seen = ? WHERE key = ?', seen_again)
+        return delta
+
+    def removed(self, keyword, place):
+        """Leads last found by this search that it no longer returns; marks them removed"""
+        rows = self.conn.execute(
+            'SELECT key, row FROM leads WHERE keyword = ? AND place = ? AND last_seen < ? AND removed_at IS NULL',
+            (keyword, place, self.started_at)
+        ).fetchall()
+        if not rows:
+            return []
+        with self.conn:
+            self.conn.executemany('UPDATE leads SET removed_at = ? WHERE key = ?', [(time.time(), key) for key, _ in rows])
+        self.counts['removed'] += len(rows)
+        return [{**json.loads(row), 'ChangeType': 'removed', 'ChangedFields': ''} for _, row in rows]
+
+    def summary(self):
+        return ', '.join(f"{count} {change}" for change, count in self.counts.items())
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception as e:
+            logging.warning(f"Error closing lead store {self.path}: {e}")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import re
+from urllib.parse import urljoin
+from lxml import html, etree
+
+RESULTS_PER_PAGE = 30
+MAX_PAGES = 100
+MAX_LISTINGS_PER_PAGE = 40
+
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# Listing selectors of MultiSessionScraper, tried in order, for both the
+# HTTP path and the browser path (which parses page.content())
+XPATH_RESULTS = [
+    etree.XPath(f"//*[{_has_class('result')}]"),
+    etree.XPath("//*[@data-testid='organic-listing']"),
+    etree.XPath(f"//*[{_has_class('search-results')}]//*[{_has_class('result')}]"),
+]
+XPATH_NAMES = [
+    etree.XPath(f".//*[{_has_class('business-name')}]//span"),
+    etree.XPath(f".//*[{_has_class('business-name')}]"),
+    etree.XPath(".//h3//a"),
+    etree.XPath(".//h2//a"),
+]
+XPATH_PHONES = [
+    etree.XPath(f".//*[{_has_class('phone')}]"),
+    etree.XPath(f".//*[{_has_class('phones')}]"),
+    etree.XPath(".//a[contains(@href, 'tel:')]"),
+]
+XPATH_ADDRESS = etree.XPath(f".//*[{_has_class('adr')} or {_has_class('address')}]")
+XPATH_WEBSITE = etree.XPath(".//a[contains(@href, 'http') and not(contains(@href, 'yellowpages.com'))]/@href")
+XPATH_CATEGORIES = etree.XPath(f".//*[{_has_class('categories')}]//a | .//*[{_has_class('category')}]")
+XPATH_PAGINATION = etree.XPath(f"//div[{_has_class('pagination')}]")
+XPATH_PAGINATION_LINKS = etree.XPath(".//ul/li")
+
+# The stricter v-card selectors ScrapMultipleLocations has always used,
+# matching class attributes exactly
+XPATH_VCARDS = etree.XPath("//div[@class='search-results organic']//div[@class='v-card']")
+XPATH_VCARD_NAME = etree.XPath(".//a[@class='business-name']//text()")
+XPATH_VCARD_PHONE = etree.XPath(".//div[@class='phones phone primary']//text()")
+XPATH_VCARD_STREET = etree.XPath(".//div[@class='street-address']//text()")
+XPATH_VCARD_LOCALITY = etree.XPath(".//div[@class='locality']//text()")
+
+NON_DIGITS = re.compile(r'\D')
+RESULT_TOTAL = re.compile(r'of\s+([\d,]+)')
+
+
+def _first_text(node, xpaths):
+    for xpath in xpaths:
+        elements = xpath(node)
+        if elements:
+            text = elements[0].text_content().strip()
+            if text:
+                return text
+    return ''
+
+
+def _first_phone(node):
+    for xpath in XPATH_PHONES:
+        elements = xpath(node)
+        if elements:
+            digits = NON_DIGITS.sub('', elements[0].text_content())
+            if len(digits) >= 10:
+                return digits
+    return ''
+
+
+def is_challenge_page(html_text):
+    """True if the HTML is Cloudflare's "Just a moment..." interstitial"""
+    head = html_text[:4096].lower()
+    return 'just a moment' in head or '_cf_chl_opt' in head
+
+
+def page_count_from_pagination(pagination, max_pages=MAX_PAGES):
+    """Work out how many result pages a search has from its pagination block.
+
+    Prefers the total result count ("Showing 1-30 of 412"), since the page
+    links only show a sliding window; falls back to the highest page link.
+    A page without pagination has a single page of results.
+    """
+    if not pagination:
+        return 1
+
+    match = RESULT_TOTAL.search(pagination.get('summary') or '')
+    if match:
+        total = int(match.group(1).replace(',', ''))
+        return max(1, min(max_pages, -(-total // RESULTS_PER_PAGE)))
+
+    page_links = [int(text) for text in pagination.get('links', []) if text.isdigit()]
+    if page_links:
+        return min(max_pages, max(page_links))
+    return 1
+
+
+def read_pagination(tree):
+    """The pagination block as {summary, links}, for page_count_from_pagination"""
+    blocks = XPATH_PAGINATION(tree)
+    if not blocks:
+        return None
+    return {
+        # Join text nodes with spaces, like innerText, so "of 95" and "1" stay apart
+        'summary': ' '.join(blocks[0].itertext()),
+        'links': [li.text_content().strip() for li in XPATH_PAGINATION_LINKS(blocks[0])],
+    }
+
+
+def parse_search_results(html_text, keyword, place, timezone, base_url='https://www.yellowpages.com'):
+    """Extract listings from a Yellow Pages search results page.
+
+    Returns (listings, tree) so callers can read more (e.g. pagination) from
+    the already-parsed document.
+    """
+    tree = html.fromstring(html_text)
+
+    results = []
+    for xpath in XPATH_RESULTS:
+        results = xpath(tree)
+        if results:
+            break
+
+    listings = []
+    for result in results[:MAX_LISTINGS_PER_PAGE]:
+        name = _first_text(result, XPATH_NAMES)
+        if not name:
+            continue
+
+        address_elements = XPATH_ADDRESS(result)
+        websites = XPATH_WEBSITE(result)
+        categories = [element.text_content().strip() for element in XPATH_CATEGORIES(result)]
+
+        listings.append({
+            'Name': name,
+            'Phone': _first_phone(result),
+            'Address': address_elements[0].text_content().strip() if address_elements else '',
+            'Website': urljoin(base_url, websites[0]) if websites else '',
+            'Category': ', '.join([category for category in categories if category][:2]),
+            'Keyword': keyword,
+            'Location': place,
+            'TimeZone': timezone,
+            'IdStatus': 'Lead',
+        })
+
+    return listings, tree
+
+
+def parse_vcards(tree):
+    """(name, phone, street, locality) of each v-card on a parsed results page"""
+    return [
+        tuple(''.join(xpath(card)).strip() for xpath in (XPATH_VCARD_NAME, XPATH_VCARD_PHONE, XPATH_VCARD_STREET, XPATH_VCARD_LOCALITY))
+        for card in XPATH_VCARDS(tree)
+    ]
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import json
+import logging
+import time
+from contextlib import contextmanager
+from aiohttp import web
+
+# Upper bounds in seconds of the stage duration histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Count, sum, max and bucketed distribution of one stage's durations"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.bucket_counts):
+            self.bucket_counts[index] += 1
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile (the max past the last bucket)"""
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """Stage timers, counters and gauges of one scraper process.
+
+    Timers record how long each stage took (browser launch, navigation,
+    Cloudflare wait, extraction...) into a histogram; counters count events
+    by label (pages by status, proxy outcomes, challenges...); gauges are
+    read from callables only when metrics are exported. Recording is a
+    dict lookup and a few additions, cheap enough for every page. Exported
+    in Prometheus text format over HTTP by `serve`, and as a JSON report.
+    """
+
+    def __init__(self, namespace='scraper', buckets=DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = buckets
+        self.started_at = time.time()
+        self.counters = {}
+        self.stages = {}
+        self.gauges = {}
+        self._runner = None
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, stage, seconds):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the enclosed block, awaits included, as one observation of `stage`"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start_time)
+
+    def gauge(self, name, read):
+        """Export `read()` as gauge `name` whenever metrics are collected"""
+        self.gauges[name] = read
+
+    def _read_gauges(self):
+        values = {}
+        for name, read in self.gauges.items():
+            try:
+                values[name] = read()
+            except Exception as e:
+                logging.debug(f"Gauge {name} unavailable: {e}")
+        return values
+
+    def render_prometheus(self):
+        ns = self.namespace
+        lines = [
+            f"# TYPE {ns}_stage_seconds histogram",
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                cumulative += count
+                lines.append(f'{ns}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{ns}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{ns}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'{ns}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {ns}_{name} counter")
+                typed.add(name)
+            lines.append(f"{ns}_{name}{_label_text(labels)} {value}")
+
+        for name, value in sorted(self._read_gauges().items()):
+            lines.append(f"# TYPE {ns}_{name} gauge")
+            lines.append(f"{ns}_{name} {value}")
+        lines.append(f"# TYPE {ns}_uptime_seconds gauge")
+        lines.append(f"{ns}_uptime_seconds {time.time() - self.started_at:.1f}")
+        return '\n'.join(lines) + '\n'
+
+    def report(self):
+        """Everything recorded so far as a JSON-serializable dict"""
+        counters = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            key = name + ''.join(f"[{label}={label_value}]" for label, label_value in labels)
+            counters[key] = value
+        return {
+            'started_at': self.started_at,
+            'elapsed_s': round(time.time() - self.started_at, 3),
+            'stages': {
+                stage: {
+                    'count': histogram.count,
+                    'total_s': round(histogram.sum, 3),
+                    'mean_s': round(histogram.sum / histogram.count, 4) if histogram.count else 0.0,
+                    'p50_s': round(histogram.quantile(0.5), 4),
+                    'p95_s': round(histogram.quantile(0.95), 4),
+                    'max_s': round(histogram.max, 4),
+                }
+                for stage, histogram in sorted(self.stages.items())
+            },
+            'counters': counters,
+            'gauges': self._read_gauges(),
+        }
+
+    def write_report(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        logging.info(f"Metrics report written to {path}")
+
+    async def _handle_metrics(self, request):
+        return web.Response(text=self.render_prometheus(), content_type='text/plain', charset='utf-8')
+
+    async def _handle_report(self, request):
+        return web.json_response(self.report())
+
+    async def serve(self, port, host='127.0.0.1'):
+        """Expose /metrics (Prometheus text) and /report (JSON) on host:port"""
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle_metrics)
+        app.router.add_get('/report', self._handle_report)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logging.info(f"Metrics on http://{host}:{port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
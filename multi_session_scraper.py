@@ -7,22 +7,135 @@ import csv
 import time
 import random
 import logging
-import sys
 import os
-import json
-import subprocess
-from urllib.parse import urlencode
-import requests
-from datetime import datetime
+import argparse
+import statistics
+import socket
+import multiprocessing
+from urllib.parse import urlencode, urlparse
+from browser_pool import BrowserPool, LAUNCH_ARGS, USER_AGENT, open_context, process_tree_rss_mb
+from rate_limiter import RateLimiter
+from scheduler import JobScheduler
+from http_fetcher import HttpFetcher, CloudflareChallenge
+from listing_parser import MAX_PAGES, parse_search_results, read_pagination, page_count_from_pagination
+from result_sink import CsvSink, FIELDNAMES
+from checkpoint import CheckpointStore
+from dedup import DedupIndex
+from proxy_manager import ProxyManager
+from resource_filter import ResourceFilter, DEFAULT_BLOCKED_TYPES, FIRST_PARTY_HOSTS
+from shard_queue import ShardQueue, merge_outputs, HEARTBEAT_INTERVAL
+from webhook_sender import WebhookSender
+from metrics import Metrics
+from page_cache import PageCache
+from clearance_store import ClearanceStore
+from concurrency_controller import ConcurrencyController
+from browser_supervisor import BrowserSupervisor
+from browser_install import ensure_chromium
+from lead_store import LeadStore, DELTA_FIELDS
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+BASE_URL = 'https://www.yellowpages.com'
+WEBHOOK_URL = 'https://n8n.vixi.agency/webhook-test/188228af-16bd-43cc-905b-296fd36c4699'
+
+# Any of the listing containers listing_parser looks for
+LISTINGS_SELECTOR = '.result, [data-testid="organic-listing"]'
+
+# Times a sharded run restarts its workers for shards left unfinished by crashes
+MAX_WORKER_ROUNDS = 3
+
+# Seconds Cloudflare fallbacks fail fast after the browser pool could not launch
+BROWSER_RETRY_INTERVAL = 60
+
+class CloudflareTimeout(Exception):
+    """Raised when the Cloudflare challenge does not clear in time"""
+
 class MultiSessionScraper:
-    def __init__(self, timezone_file='pst.csv'):
+    def __init__(self, timezone_file='pst.csv', browser_mode='pool', pool_size=5, pages_per_context=10,
+                 max_pages=MAX_PAGES, empty_page_limit=3, proxy_interval=5.0, host_interval=0.5, engine='hybrid',
+                 max_file_mb=50, checkpoint_path=None, resume=False, dedup_path=None, dedup_max_entries=1_000_000,
+                 proxy_refresh_minutes=30, ready_timeout=15.0, blocked_types=DEFAULT_BLOCKED_TYPES,
+                 base_url=BASE_URL, webhook_url=WEBHOOK_URL, proxy_manager=None, direct=False,
+                 output_prefix='multi_session_final', proxy_shard=None, webhook_batch_size=500,
+                 webhook_interval=30.0, webhook_spool='webhook_spool', metrics_port=None,
+                 page_cache_path='page_cache.db', cache_ttl_hours=168, cache_max_mb=500,
+                 min_concurrency=1, max_concurrency=None, max_memory_percent=85.0,
+                 delta_path=None, delta_started_at=None, browser_max_rss_mb=1024, browser_max_pages=200,
+                 page_deadline=180, proxy_cache='proxy_list_cache.txt'):
         self.timezone_file = timezone_file
         self.timezone = self.get_timezone_from_file(timezone_file)
-        self.proxies = self.load_proxy_list()
-        self.all_results = []
+        self.base_url = base_url
+        self.webhook_url = webhook_url
+        self.webhook_batch_size = webhook_batch_size
+        self.webhook_interval = webhook_interval
+        self.webhook_spool = webhook_spool
+        self.webhook = None
+        # Stage timers and counters, served on metrics_port while the run goes
+        self.metrics = Metrics()
+        self.metrics_port = metrics_port
+        # direct=True connects without proxies instead of aborting when there are none
+        self.direct = direct
+        if proxy_manager is None:
+            # A cached list is used at once; a stale one is refreshed once the run starts
+            proxy_manager = ProxyManager(refresh_interval=proxy_refresh_minutes * 60, shard=proxy_shard,
+                                         cache_path=proxy_cache, cache_ttl=(proxy_refresh_minutes or 30) * 60)
+            if not direct:
+                proxy_manager.load()
+        self.proxy_manager = proxy_manager
+        # Pages fetched within cache_ttl_hours are parsed from disk, without any proxy traffic
+        self.page_cache_path = page_cache_path
+        self.cache_ttl_hours = cache_ttl_hours
+        self.cache_max_mb = cache_max_mb
+        self.page_cache = None
+        # With a lead store, only new, changed and removed leads are output
+        self.delta_path = delta_path
+        self.delta_started_at = delta_started_at
+        self.lead_store = None
+        self.sink = None
+        self.output_prefix = output_prefix
+        self.max_file_mb = max_file_mb
+        self.checkpoint_path = checkpoint_path or f"{os.path.splitext(timezone_file)[0]}_checkpoint.db"
+        self.resume = resume
+        self.checkpoint = None
+        # Yellow Pages repeats "Serving your area" advertisers on every page
+        self.dedup = DedupIndex(max_entries=dedup_max_entries, path=dedup_path)
+        self.browser_mode = browser_mode
+        self.pool_size = pool_size
+        # Pages in flight start at pool_size and follow what the site and the host tolerate.
+        # Pooled browser runs cannot have more pages in flight than browsers.
+        ceiling = max_concurrency or pool_size * 4
+        if engine == 'browser' and browser_mode == 'pool':
+            ceiling = min(ceiling, pool_size)
+        self.concurrency = ConcurrencyController(
+            initial=pool_size,
+            floor=min_concurrency,
+            ceiling=ceiling,
+            max_memory_percent=max_memory_percent,
+            metrics=self.metrics
+        )
+        self.pages_per_context = pages_per_context
+        self.browser_pool = None
+        self._browser_pool_lock = asyncio.Lock()
+        self._browser_pool_retry_at = 0.0
+        # Watches every Chromium launched: hung pages, memory and page caps, leaked processes
+        self.supervisor = BrowserSupervisor(max_rss_mb=browser_max_rss_mb, max_pages=browser_max_pages,
+                                            page_deadline=page_deadline, metrics=self.metrics)
+        self.page_latencies = []
+        self.max_pages = max_pages
+        self.empty_page_limit = empty_page_limit
+        self.pages_scraped = 0
+        # Politeness: one request per proxy every proxy_interval seconds and
+        # one request to the target host every host_interval seconds
+        self.proxy_limiter = RateLimiter(proxy_interval, jitter=proxy_interval / 2)
+        self.host_limiter = RateLimiter(host_interval)
+        self.ready_timeout = ready_timeout
+        # Proxy bandwidth is billed: only fetch what the challenge and listings need
+        self.resource_filter = ResourceFilter(blocked_types=blocked_types, allowed_hosts=FIRST_PARTY_HOSTS + (urlparse(base_url).hostname,))
+        # 'hybrid' tries plain HTTP first and only opens a browser for Cloudflare
+        self.engine = engine
+        # Cloudflare clearance per proxy, reused by every new browser context and HTTP session
+        self.clearances = ClearanceStore()
+        self.http_fetcher = HttpFetcher(USER_AGENT, clearances=self.clearances) if engine == 'hybrid' else None
     
     def get_timezone_from_file(self, filename):
         """Extract timezone from filename"""
@@ -34,402 +147,788 @@ class MultiSessionScraper:
         }
         return timezone_map.get(filename, 'PST')
         
-    def load_proxy_list(self):
+    def build_search_url(self, keyword, place, page_num):
+        return f"{self.base_url}/search?{urlencode({'search_terms': keyword, 'geo_location_terms': place, 'page': page_num})}"
+    
+    def record_proxy(self, proxy_id, start_time, error=None, queue_wait=0.0):
+        """Feed a request's outcome and latency back into the proxy health scores.
+        
+        `queue_wait`, time spent waiting for a pooled browser, is only seen by
+        the concurrency controller: it says nothing about the proxy.
+        """
+        if error is None:
+            outcome = 'ok'
+        elif isinstance(error, (CloudflareChallenge, CloudflareTimeout)):
+            outcome = 'challenge'
+        else:
+            outcome = 'failed'
+        self.metrics.inc('proxy_requests_total', outcome=outcome)
+        if outcome == 'challenge':
+            self.clearances.invalidate(proxy_id)
+        latency = time.perf_counter() - start_time
+        self.proxy_manager.record(proxy_id, outcome, latency)
+        self.concurrency.record(outcome, latency + queue_wait)
+    
+    async def throttle(self, proxy_id, url):
+        """Wait for this proxy's and the target host's next request slot"""
+        await self.proxy_limiter.wait(proxy_id)
+        await self.host_limiter.wait(urlparse(url).netloc)
+    
+    async def wait_until_ready(self, page):
+        """Wait for the listings to render, or for the network to go idle on pages without any.
+        
+        Whichever comes first ends the wait; if neither happens within
+        ready_timeout seconds extraction goes ahead with what is there.
+        """
+        timeout = self.ready_timeout * 1000
+        waits = [
+            asyncio.create_task(page.wait_for_selector(LISTINGS_SELECTOR, state='attached', timeout=timeout)),
+            asyncio.create_task(page.wait_for_load_state('networkidle', timeout=timeout)),
+        ]
+        done, pending = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+        for wait in pending:
+            wait.cancel()
+        await asyncio.gather(*waits, return_exceptions=True)
+    
+    async def extract_listings_from_page(self, page, keyword, place, page_num):
+        """Navigate an open page to the search results and extract its listings.
+        
+        Returns (listings, last_page); last_page is only read on page 1.
+        """
+        url = self.build_search_url(keyword, place, page_num)
+        resources = await self.resource_filter.attach(page)
         try:
-            response = requests.get(
-                'https://proxy.webshare.io/api/v2/proxy/list/download/qmdbkedkgvtgrenpwvkkqezvxftqmwtcgcpkcquu/-/any/sourceip/direct/-/?plan_id=10580741',
-                timeout=30
-            )
-            proxies = []
-            for line in response.text.split('\n'):
-                if ':' in line.strip():
-                    host, port = line.strip().split(':')
-                    proxies.append({'server': f'http://{host}:{port}', 'id': f'{host}:{port}'})
-            logging.info(f"Loaded {len(proxies)} proxies")
-            return proxies
-        except:
-            return []
+            return await self._extract_listings(page, url, keyword, place, page_num)
+        finally:
+            self.resource_filter.totals.add(resources)
+            logging.info(f"Page {page_num}: {resources.summary()}")
+    
+    async def _extract_listings(self, page, url, keyword, place, page_num):
+        # Navigate
+        with self.metrics.timer('navigation'):
+            await page.goto(url, wait_until='domcontentloaded', timeout=60000)
+        
+        # Handle Cloudflare
+        title = await page.title()
+        if 'just a moment' in title.lower():
+            logging.info(f"Page {page_num}: Cloudflare detected, waiting...")
+            self.metrics.inc('challenges_total', path='browser')
+            
+            # Human simulation
+            await page.mouse.move(random.randint(200, 600), random.randint(200, 400))
+            
+            # Wait for completion
+            try:
+                with self.metrics.timer('cloudflare_wait'):
+                    await page.wait_for_function(
+                        "document.title !== 'Just a moment...'",
+                        timeout=30000
+                    )
+                logging.info(f"Page {page_num}: Cloudflare bypassed")
+            except Exception:
+                self.metrics.inc('challenge_timeouts_total')
+                raise CloudflareTimeout(f"Cloudflare timeout on {url}")
+        
+        # Wait for content
+        with self.metrics.timer('ready_wait'):
+            await self.wait_until_ready(page)
+        
+        # Extract listings with the same parser as the HTTP path
+        html_text = await page.content()
+        fetched = self.parse_page(html_text, keyword, place, page_num)
+        if fetched[0]:
+            self.cache_page(url, html_text)
+        return fetched
+    
+    def parse_page(self, html_text, keyword, place, page_num):
+        """(listings, last_page) from a results page's HTML; last_page only for page 1"""
+        with self.metrics.timer('extraction'):
+            listings, tree = parse_search_results(html_text, keyword, place, self.timezone, self.base_url)
+            last_page = None
+            if page_num == 1:
+                last_page = page_count_from_pagination(read_pagination(tree), self.max_pages)
+        return listings, last_page
     
     async def scrape_single_page_new_session(self, keyword, place, page_num):
         """Scrape a single page using a completely new browser session"""
         playwright = None
+        browser = None
+        supervised = None
         try:
-            # Create fresh browser for each page
-            playwright = await async_playwright().__aenter__()
-            
-            # Random proxy for this session
-            proxy = random.choice(self.proxies) if self.proxies else None
-            
-            browser = await playwright.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-first-run',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-web-security',
-                    '--disable-dev-shm-usage',
-                    '--no-sandbox'
-                ],
-                proxy=proxy
-            )
-            
-            context = await browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            
-            page = await context.new_page()
-            
-            # Stealth
-            await page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined});")
+            # Healthiest proxies are the most likely to be picked for this session,
+            # and those already cleared by Cloudflare (which skip the challenge) are favoured
+            proxy = self.proxy_manager.pick(prefer=self.clearances.proxy_ids())
+            proxy_id = proxy['id'] if proxy else 'direct'
             
-            # Build URL
-            url = f"https://www.yellowpages.com/search?{urlencode({'search_terms': keyword, 'geo_location_terms': place, 'page': page_num})}"
+            # Wait for the proxy's request slot before launching, so no browser sits idle meanwhile
+            url = self.build_search_url(keyword, place, page_num)
+            await self.throttle(proxy_id, url)
             
-            logging.info(f"NEW SESSION - Page {page_num}: {url} via {proxy['id'] if proxy else 'direct'}")
-            
-            # Navigate
-            await page.goto(url, wait_until='domcontentloaded', timeout=60000)
+            # Create fresh browser for each page
+            playwright = await async_playwright().start()
             
-            # Handle Cloudflare
-            title = await page.title()
-            if 'just a moment' in title.lower():
-                logging.info(f"Page {page_num}: Cloudflare detected, waiting...")
-                
-                # Human simulation
-                await page.mouse.move(random.randint(200, 600), random.randint(200, 400))
-                await asyncio.sleep(random.uniform(2, 4))
-                
-                # Wait for completion
-                try:
-                    await page.wait_for_function(
-                        "document.title !== 'Just a moment...'",
-                        timeout=30000
-                    )
-                    logging.info(f"Page {page_num}: Cloudflare bypassed")
-                except:
-                    logging.error(f"Page {page_num}: Cloudflare timeout")
-                    return []
+            with self.metrics.timer('browser_launch'):
+                browser = await playwright.chromium.launch(
+                    headless=True,
+                    args=LAUNCH_ARGS,
+                    proxy=proxy
+                )
+            supervised = await self.supervisor.register(browser, f"Session browser for page {page_num}")
+            self.supervisor.page_started(supervised)
             
-            # Wait for content
-            await asyncio.sleep(random.uniform(4, 7))
+            with self.metrics.timer('context_create'):
+                context = await open_context(browser, self.clearances.seed(proxy_id))
             
-            # Extract listings
-            listings = await page.evaluate(f"""
-                () => {{
-                    const selectors = ['.result', '[data-testid="organic-listing"]', '.search-results .result'];
-                    let results = [];
-                    
-                    for (const selector of selectors) {{
-                        results = document.querySelectorAll(selector);
-                        if (results.length > 0) break;
-                    }}
-                    
-                    if (results.length === 0) {{
-                        // Check if page has business content
-                        const bodyText = document.body.innerText.toLowerCase();
-                        if (!bodyText.includes('business') && !bodyText.includes('phone')) {{
-                            console.log('No business content found');
-                        }}
-                        return [];
-                    }}
-                    
-                    const listings = [];
-                    
-                    for (let i = 0; i < results.length && i < 40; i++) {{
-                        const result = results[i];
-                        try {{
-                            // Name
-                            let name = '';
-                            const nameSelectors = ['.business-name span', '.business-name', 'h3 a', 'h2 a'];
-                            for (const sel of nameSelectors) {{
-                                const elem = result.querySelector(sel);
-                                if (elem && elem.textContent.trim()) {{
-                                    name = elem.textContent.trim();
-                                    break;
-                                }}
-                            }}
-                            if (!name) continue;
-                            
-                            // Phone
-                            let phone = '';
-                            const phoneSelectors = ['.phone', '.phones', 'a[href*="tel:"]'];
-                            for (const sel of phoneSelectors) {{
-                                const elem = result.querySelector(sel);
-                                if (elem) {{
-                                    const phoneText = elem.textContent.replace(/\\D/g, '');
-                                    if (phoneText.length >= 10) {{
-                                        phone = phoneText;
-                                        break;
-                                    }}
-                                }}
-                            }}
-                            
-                            // Address
-                            let address = '';
-                            const addrElem = result.querySelector('.adr, .address');
-                            if (addrElem) address = addrElem.textContent.trim();
-                            
-                            // Website
-                            let website = '';
-                            const webElem = result.querySelector('a[href*="http"]:not([href*="yellowpages.com"])');
-                            if (webElem) website = webElem.href;
-                            
-                            // Categories
-                            let categories = '';
-                            const catElems = result.querySelectorAll('.categories a, .category');
-                            if (catElems.length > 0) {{
-                                categories = Array.from(catElems)
-                                    .map(e => e.textContent.trim())
-                                    .filter(c => c)
-                                    .slice(0, 2)
-                                    .join(', ');
-                            }}
-                            
-                            listings.push({{
-                                Name: name,
-                                Phone: phone,
-                                Address: address,
-                                Website: website,
-                                Category: categories,
-                                Keyword: '{keyword}',
-                                Location: '{place}',
-                                TimeZone: '{self.timezone}',
-                                IdStatus: 'Lead',
-                            }});
-                            
-                        }} catch (error) {{
-                            console.error('Extraction error:', error);
-                        }}
-                    }}
-                    
-                    return listings;
-                }}
-            """)
+            page = await context.new_page()
             
-            if listings:
-                logging.info(f"Page {page_num}: SUCCESS - {len(listings)} listings extracted")
-            else:
-                logging.warning(f"Page {page_num}: No listings found")
+            logging.info(f"NEW SESSION - Page {page_num}: {url} via {proxy_id}")
             
-            return listings
+            start_time = time.perf_counter()
+            try:
+                fetched = await self.extract_listings_from_page(page, keyword, place, page_num)
+            except Exception as e:
+                self.record_proxy(proxy_id, start_time, e)
+                raise
+            self.record_proxy(proxy_id, start_time)
+            await self.store_clearance(proxy_id, context)
+            return fetched
             
-        except Exception as e:
-            logging.error(f"Page {page_num} error: {e}")
-            return []
         finally:
-            if playwright:
+            # Close each part on its own, so one failure cannot leave the rest running
+            if browser is not None:
                 try:
                     await browser.close()
-                    await playwright.__aexit__(None, None, None)
-                except:
-                    pass
+                except Exception as e:
+                    logging.warning(f"Page {page_num}: error closing browser: {e}")
+            if supervised is not None:
+                await self.supervisor.unregister(supervised)
+            if playwright is not None:
+                try:
+                    await playwright.stop()
+                except Exception as e:
+                    logging.warning(f"Page {page_num}: error stopping Playwright: {e}")
+    
+    async def start_browser_pool(self):
+        """The browser pool, launched on first use.
+        
+        Hybrid runs only need browsers for Cloudflare fallbacks, so they do
+        not keep Chromium around (or require it installed) until one
+        happens. After a failed launch, fallbacks fail fast for
+        BROWSER_RETRY_INTERVAL seconds instead of relaunching on every page.
+        """
+        async with self._browser_pool_lock:
+            if self.browser_pool is not None:
+                return self.browser_pool
+            if time.monotonic() < self._browser_pool_retry_at:
+                raise RuntimeError("Browser pool unavailable after a failed launch")
+            pool = BrowserPool(self.proxy_manager, size=self.pool_size, pages_per_context=self.pages_per_context,
+                               metrics=self.metrics, clearances=self.clearances, supervisor=self.supervisor)
+            try:
+                await pool.start()
+            except Exception:
+                self._browser_pool_retry_at = time.monotonic() + BROWSER_RETRY_INTERVAL
+                await pool.close()
+                raise
+            self.browser_pool = pool
+            return pool
+    
+    async def scrape_single_page_pooled(self, keyword, place, page_num):
+        """Scrape a single page in a fresh page of a long-lived pooled browser"""
+        browser_pool = await self.start_browser_pool()
+        lease_start = time.perf_counter()
+        async with browser_pool.page() as (page, slot):
+            # Time spent waiting for a free browser goes to the concurrency
+            # controller, so it sees the pool running out
+            lease_wait = time.perf_counter() - lease_start
+            url = self.build_search_url(keyword, place, page_num)
+            await self.throttle(slot.proxy_id, url)
+            logging.info(f"POOLED SESSION - Page {page_num}: {url} via {slot.proxy_id} (browser #{slot.slot_id})")
+            start_time = time.perf_counter()
+            try:
+                fetched = await self.extract_listings_from_page(page, keyword, place, page_num)
+            except Exception as e:
+                self.record_proxy(slot.proxy_id, start_time, e, queue_wait=lease_wait)
+                # Cloudflare failures and broken pages both get a fresh context
+                slot.recycle_context = True
+                raise
+            self.record_proxy(slot.proxy_id, start_time, queue_wait=lease_wait)
+            await self.store_clearance(slot.proxy_id, slot.context)
+            return fetched
     
-    async def scrape_multiple_pages_parallel(self, keyword, place, pages_to_scrape):
-        """Scrape multiple pages in parallel using different browser sessions"""
-        logging.info(f"Scraping {len(pages_to_scrape)} pages in parallel for '{keyword}' in {place}")
+    async def scrape_single_page_browser(self, keyword, place, page_num):
+        if self.browser_mode == 'pool':
+            return await self.scrape_single_page_pooled(keyword, place, page_num)
+        return await self.scrape_single_page_new_session(keyword, place, page_num)
+    
+    async def store_clearance(self, proxy_id, context):
+        """Keep a browser's Cloudflare clearance for the proxy's next contexts and HTTP requests"""
+        self.clearances.record(proxy_id, await context.cookies(), USER_AGENT)
+    
+    async def scrape_single_page_http(self, keyword, place, page_num):
+        """Fetch and parse a single page over plain HTTP, without a browser"""
+        # Proxies whose clearance cookies we hold are the least likely to be challenged: favour them
+        proxy = self.proxy_manager.pick(prefer=self.clearances.proxy_ids())
+        proxy_id = proxy['id'] if proxy else 'direct'
         
-        # Limit concurrent sessions to avoid overwhelming
-        semaphore = asyncio.Semaphore(5)  # Back to 5 concurrent browsers for local power
+        url = self.build_search_url(keyword, place, page_num)
+        await self.throttle(proxy_id, url)
+        logging.info(f"HTTP - Page {page_num}: {url} via {proxy_id}")
         
-        async def scrape_with_semaphore(page_num):
-            async with semaphore:
-                # Random delay to spread requests
-                await asyncio.sleep(random.uniform(0, 5))
-                return await self.scrape_single_page_new_session(keyword, place, page_num)
+        start_time = time.perf_counter()
+        try:
+            with self.metrics.timer('http_fetch'):
+                status, text = await self.http_fetcher.fetch(url, proxy)
+            if status not in (200, 404):
+                raise Exception(f"HTTP {status} for {url}")
+        except Exception as e:
+            self.record_proxy(proxy_id, start_time, e)
+            raise
+        self.record_proxy(proxy_id, start_time)
         
-        # Create tasks for all pages
-        tasks = [scrape_with_semaphore(page_num) for page_num in pages_to_scrape]
+        if status == 404:
+            # Yellow Pages answers 404 when a search has no results
+            self.cache_page(url, '', status)
+            return [], None
         
-        # Execute all tasks
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        fetched = self.parse_page(text, keyword, place, page_num)
+        if fetched[0]:
+            self.cache_page(url, text)
+        return fetched
+    
+    def cache_page(self, url, html_text, status=200):
+        """Keep a page for reruns; only pages with listings or a 404 are worth it"""
+        if self.page_cache is None:
+            return
+        try:
+            self.page_cache.put(url, html_text, status)
+            self.metrics.inc('page_cache_total', result='stored')
+        except Exception as e:
+            logging.warning(f"Could not cache {url}: {e}")
+    
+    def cached_page(self, keyword, place, page_num):
+        """(listings, last_page) of a page still fresh in the page cache, or None"""
+        if self.page_cache is None:
+            return None
+        url = self.build_search_url(keyword, place, page_num)
+        cached = self.page_cache.get(url)
+        self.metrics.inc('page_cache_total', result='hit' if cached else 'miss')
+        if cached is None:
+            return None
+        status, html_text = cached
+        logging.info(f"CACHE - Page {page_num}: {url}")
+        if status == 404:
+            return [], None
+        return self.parse_page(html_text, keyword, place, page_num)
+    
+    async def scrape_single_page(self, keyword, place, page_num):
+        """Scrape one page with the configured browser mode and record its latency.
         
-        # Collect all listings
-        all_listings = []
-        successful_pages = 0
+        Returns a page result dict whose status is 'ok', 'empty' or 'failed',
+        so callers can tell a page without listings from one that never loaded.
+        """
+        result = {
+            'keyword': keyword,
+            'place': place,
+            'page': page_num,
+            'listings': [],
+            'last_page': None,
+            'status': 'failed',
+            'error': None,
+        }
         
-        for i, result in enumerate(results):
-            page_num = pages_to_scrape[i]
-            
-            if isinstance(result, Exception):
-                logging.error(f"Page {page_num} failed with exception: {result}")
-            elif isinstance(result, list):
-                all_listings.extend(result)
-                if result:
-                    successful_pages += 1
-                    logging.info(f"Page {page_num}: Added {len(result)} listings")
-        
-        logging.info(f"PARALLEL SCRAPING COMPLETE: {len(all_listings)} total listings from {successful_pages} successful pages")
-        return all_listings
-    
-    def save_results(self, results, filename):
-        """Save results to CSV"""
-        if not results:
+        start_time = time.perf_counter()
+        engine = 'cache'
+        try:
+            fetched = self.cached_page(keyword, place, page_num)
+            if fetched is None and self.http_fetcher is not None:
+                engine = 'http'
+                try:
+                    fetched = await self.scrape_single_page_http(keyword, place, page_num)
+                except CloudflareChallenge:
+                    logging.info(f"Page {page_num}: Cloudflare challenge over HTTP, falling back to the browser")
+                    self.metrics.inc('challenges_total', path='http')
+            if fetched is None:
+                engine = 'browser'
+                fetched = await self.scrape_single_page_browser(keyword, place, page_num)
+            result['listings'], result['last_page'] = fetched
+            result['status'] = 'ok' if result['listings'] else 'empty'
+        except CloudflareTimeout as e:
+            result['error'] = str(e)
+            logging.error(f"Page {page_num}: Cloudflare timeout")
+        except Exception as e:
+            result['error'] = str(e)
+            logging.error(f"Page {page_num} error: {e}")
+        
+        elapsed = time.perf_counter() - start_time
+        self.page_latencies.append(elapsed)
+        self.metrics.observe('page', elapsed)
+        self.metrics.inc('pages_total', status=result['status'], engine=engine)
+        self.pages_scraped += 1
+        
+        if result['status'] == 'ok':
+            logging.info(f"Page {page_num}: SUCCESS - {len(result['listings'])} listings extracted in {elapsed:.1f}s")
+        elif result['status'] == 'empty':
+            logging.warning(f"Page {page_num}: No listings found ({elapsed:.1f}s)")
+        
+        return result
+    
+    def log_performance(self):
+        """Log per-page latency and memory so browser modes can be compared"""
+        if not self.page_latencies:
             return
+        latencies = sorted(self.page_latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        logging.info(
+            f"PERFORMANCE [{self.browser_mode}]: {len(latencies)} pages, "
+            f"mean {statistics.mean(latencies):.1f}s, median {statistics.median(latencies):.1f}s, "
+            f"p95 {p95:.1f}s, RSS {process_tree_rss_mb():.0f} MB"
+        )
+    
+    async def on_page(self, combination, result):
+        """Stream a finished page's listings straight to the CSV sink.
         
-        fieldnames = ['Name', 'Phone', 'Address', 'Website', 'Category', 'Keyword', 'Location', 'TimeZone', 'IdStatus']
+        In delta mode only the new and changed leads go on. Listings already
+        emitted are dropped next, and the page is checkpointed once the sink
+        has flushed its rows to disk. The same listings are queued for the
+        webhook, which gets them in batches as the run goes.
+        """
+        listings = result['listings']
+        if self.lead_store:
+            listings = self.lead_store.diff(listings, result['keyword'], result['place'])
+        listings = self.dedup.filter(listings)
+        self.metrics.inc('listings_total', len(result['listings']))
+        await self.sink.write(listings, token=result)
+        if self.webhook:
+            self.webhook.send(listings)
+    
+    async def on_combination_done(self, combination):
+        """Report a keyword-place combination once all its pages are in"""
+        self.metrics.inc('searches_total')
+        self.metrics.inc('pages_cancelled_total', combination.pages_cancelled)
+        if self.lead_store:
+            await self.emit_removed_leads(combination)
+        if not combination.listing_count:
+            return
         
-        with open(filename, 'w', encoding='utf-8', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(results)
+        # Put the search's rows on disk, so there is a file to point at
+        await self.sink.flush()
+        elapsed = time.time() - combination.started_at
         
-        logging.info(f"Saved {len(results)} results to {filename}")
+        print(f"\nRESULTS FOR '{combination.keyword}' in {combination.place}:")
+        print(f"Time taken: {elapsed:.1f} seconds")
+        print(f"Listings found: {combination.listing_count}")
+        print(f"Total pages scraped: {combination.pages_scraped}")
+        print(f"Saved to: {self.sink.current_file or 'nothing new to save'}")
     
-    def send_to_webhook(self, results, filename):
-        """Send results to N8N webhook"""
-        webhook_url = "https://n8n.vixi.agency/webhook-test/188228af-16bd-43cc-905b-296fd36c4699"
+    async def emit_removed_leads(self, combination):
+        """Output the leads this search returned before but no longer does.
         
-        try:
-            # Prepare data to send
-            payload = {
-                "filename": filename,
-                "total_listings": len(results),
-                "timezone": self.timezone,
-                "timestamp": datetime.now().isoformat(),
-                "data": results[:10]  # Send first 10 as preview
-            }
-            
-            # Send as JSON
-            response = requests.post(
-                webhook_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                logging.info(f"Successfully sent {len(results)} results to N8N webhook")
-            else:
-                logging.error(f"Webhook failed with status {response.status_code}: {response.text}")
-                
-        except Exception as e:
-            logging.error(f"Error sending to webhook: {e}")
+        Only a search whose every page, 1 through the last one pagination
+        reported, came back with listings can tell a lead is gone: empty
+        pages may be soft blocks, and a search cut short by them never saw
+        its later pages. A resumed run did not see the pages it skipped.
+        """
+        if self.resume or not combination.last_page:
+            return
+        if combination.cutoff is not None or combination.pages_ok < combination.last_page:
+            logging.info(f"{combination.label}: {combination.pages_ok} of {combination.last_page} pages loaded, "
+                         f"not checking for removed leads")
+            return
+        removed = self.lead_store.removed(combination.keyword, combination.place)
+        if removed:
+            logging.info(f"{combination.label}: {len(removed)} leads no longer listed")
+            await self.sink.write(removed)
+            if self.webhook:
+                self.webhook.send(removed)
+    
+    async def start_metrics(self):
+        """Register the gauges read at export time and serve metrics if a port is set"""
+        self.metrics.gauge('proxies', lambda: len(self.proxy_manager.proxies))
+        self.metrics.gauge('proxies_available', lambda: sum(
+            1 for proxy in self.proxy_manager.proxies if self.proxy_manager.is_available(proxy['id'])
+        ))
+        self.metrics.gauge('rss_mb', lambda: round(process_tree_rss_mb(), 1))
+        self.metrics.gauge('rows_written', lambda: self.sink.rows_written)
+        self.metrics.gauge('duplicates_dropped', lambda: self.dedup.duplicates)
+        if self.lead_store:
+            for change in self.lead_store.counts:
+                self.metrics.gauge(f'leads_{change}', lambda change=change: self.lead_store.counts[change])
+        self.metrics.gauge('browsers_supervised', lambda: len(self.supervisor.browsers))
+        self.metrics.gauge('concurrency_limit', lambda: self.concurrency.limit)
+        self.metrics.gauge('pages_in_flight', lambda: self.concurrency.in_flight)
+        self.metrics.gauge('cleared_proxies', lambda: len(self.clearances.proxy_ids()))
+        self.metrics.gauge('clearances_reused', lambda: self.clearances.reused)
+        self.metrics.gauge('resource_requests_blocked', lambda: self.resource_filter.totals.blocked_total)
+        if self.page_cache:
+            self.metrics.gauge('page_cache_mb', lambda: round(self.page_cache.total_bytes / 1024 / 1024, 1))
+        if self.metrics_port:
+            await self.metrics.serve(self.metrics_port)
+    
+    def build_scheduler(self, on_combination_done):
+        return JobScheduler(
+            self.scrape_single_page,
+            max_pages=self.max_pages,
+            empty_page_limit=self.empty_page_limit,
+            on_page=self.on_page,
+            on_combination_done=on_combination_done,
+            concurrency=self.concurrency
+        )
+    
+    def add_search(self, scheduler, keyword, place):
+        """Queue one search, skipping the pages a resumed checkpoint already has"""
+        if not self.resume:
+            return scheduler.add_combination(keyword, place)
+        last_page, done_pages = self.checkpoint.search_state(keyword, place)
+        return scheduler.add_combination(keyword, place, done_pages=done_pages, last_page=last_page)
     
-    def send_csv_to_webhook(self, filename):
-        """Send CSV file to N8N webhook"""
-        webhook_url = "https://n8n.vixi.agency/webhook-test/188228af-16bd-43cc-905b-296fd36c4699"
+    async def scrape_all_combinations(self, keywords, places):
+        """Scrape every keyword-place combination through one shared job queue"""
+        scheduler = self.build_scheduler(self.on_combination_done)
+        for place in places:
+            for keyword in keywords:
+                self.add_search(scheduler, keyword, place)
         
-        try:
-            with open(filename, 'rb') as csv_file:
-                files = {'file': (filename, csv_file, 'text/csv')}
-                data = {
-                    'timezone': self.timezone,
-                    'timestamp': datetime.now().isoformat()
-                }
-                
-                response = requests.post(
-                    webhook_url,
-                    files=files,
-                    data=data,
-                    timeout=60
-                )
-                
-                if response.status_code == 200:
-                    logging.info(f"Successfully sent CSV file {filename} to N8N webhook")
-                else:
-                    logging.error(f"CSV webhook failed with status {response.status_code}: {response.text}")
-                    
-        except Exception as e:
-            logging.error(f"Error sending CSV to webhook: {e}")
+        if self.resume:
+            skipped_pages = sum(len(combination.done_pages) for combination in scheduler.combinations)
+            logging.info(f"Resuming from {self.checkpoint_path}: skipping {skipped_pages} pages already done")
+        
+        print(f"\n{'='*70}")
+        print(f"MULTI-SESSION SCRAPING: {len(scheduler.combinations)} keyword-place combinations")
+        print(f"{'='*70}")
+        
+        await scheduler.run()
+        self.log_performance()
     
-    def ensure_playwright_browsers(self):
-        """Ensure Playwright browsers are installed"""
+    async def scrape_shards(self, shard_queue, worker_id):
+        """Scrape keyword-place shards claimed from a ShardQueue until it runs dry.
+        
+        One shard per scheduler worker is kept in flight; as each finishes,
+        its listings are flushed to disk, it is marked done and the next
+        shard is claimed in its place.
+        """
+        def claim_next():
+            while (shard := shard_queue.claim(worker_id)) is not None:
+                keyword, place = shard
+                if self.add_search(scheduler, keyword, place).outstanding:
+                    return
+                # Every page was already done in a previous run
+                shard_queue.complete(keyword, place, worker_id)
+        
+        async def on_shard_done(combination):
+            await self.on_combination_done(combination)
+            await self.sink.flush()
+            shard_queue.complete(combination.keyword, combination.place, worker_id)
+            claim_next()
+        
+        async def heartbeat():
+            while True:
+                shard_queue.heartbeat(worker_id)
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
+        
+        scheduler = self.build_scheduler(on_shard_done)
+        shard_queue.heartbeat(worker_id)
+        beating = asyncio.create_task(heartbeat())
         try:
-            logging.info("Checking Playwright browser installation...")
-            result = subprocess.run(['playwright', 'install', 'chromium'], 
-                                  capture_output=True, text=True, timeout=300)
-            if result.returncode == 0:
-                logging.info("Playwright browsers installed successfully")
-            else:
-                logging.warning(f"Playwright install warning: {result.stderr}")
-        except Exception as e:
-            logging.error(f"Failed to install Playwright browsers: {e}")
-
-    async def run_multi_session_scraper(self):
-        """Run multi-session scraper"""
-        if not self.proxies:
+            for _ in range(self.pool_size):
+                claim_next()
+            logging.info(f"Worker {worker_id}: starting with {len(scheduler.combinations)} shards")
+            await scheduler.run()
+        finally:
+            beating.cancel()
+            await asyncio.gather(beating, return_exceptions=True)
+        logging.info(f"Worker {worker_id}: queue empty after {len(scheduler.combinations)} shards")
+        self.log_performance()
+    
+    def load_search_terms(self, keywords=None, places=None):
+        """Keywords and places, defaulting to keywords.csv and the timezone file"""
+        if keywords is None:
+            try:
+                with open('keywords.csv', 'r', encoding='utf-8') as f:
+                    keywords = [row[0].strip() for row in csv.reader(f) if row]
+            except:
+                keywords = ['Real Estate']
+        
+        if places is None:
+            try:
+                with open(self.timezone_file, 'r', encoding='utf-8') as f:
+                    places = [row[0].strip() for row in csv.reader(f) if row]
+            except:
+                places = ['CA']
+        return keywords, places
+    
+    async def run_multi_session_scraper(self, keywords=None, places=None, shard_queue=None, worker_id=None):
+        """Run multi-session scraper; keywords and places default to keywords.csv and the timezone file.
+        
+        With a `shard_queue`, run as one worker of a sharded run instead:
+        scrape whatever combinations the queue hands out and register the
+        output files with it.
+        """
+        if not self.proxy_manager.proxies and not self.direct:
             logging.error("No proxies available")
             return
         
-        # Load keywords and places
-        keywords = []
-        places = []
+        if shard_queue is None:
+            keywords, places = self.load_search_terms(keywords, places)
+            logging.info(f"Starting multi-session scraper: {len(keywords)} keywords, {len(places)} places, engine '{self.engine}', browser mode '{self.browser_mode}'")
         
-        try:
-            with open('keywords.csv', 'r', encoding='utf-8') as f:
-                keywords = [row[0].strip() for row in csv.reader(f) if row]
-        except:
-            keywords = ['Real Estate']
+        if self.browser_mode == 'pool' and self.engine == 'browser':
+            await self.start_browser_pool()
         
-        try:
-            with open(self.timezone_file, 'r', encoding='utf-8') as f:
-                places = [row[0].strip() for row in csv.reader(f) if row]
-        except:
-            places = ['CA']
+        self.checkpoint = CheckpointStore(self.checkpoint_path)
+        if not self.resume:
+            self.checkpoint.reset()
         
-        logging.info(f"Starting multi-session scraper: {len(keywords)} keywords, {len(places)} places")
+        fieldnames = FIELDNAMES
+        if self.delta_path:
+            self.lead_store = LeadStore(self.delta_path, started_at=self.delta_started_at)
+            fieldnames = FIELDNAMES + DELTA_FIELDS
         
-        for place in places:
-            for keyword in keywords:
-                start_time = time.time()
-                
-                print(f"\n{'='*70}")
-                print(f"MULTI-SESSION SCRAPING: '{keyword}' in {place}")
-                print(f"{'='*70}")
-                
-                # Define pages to scrape - full power for local execution
-                pages_to_test = list(range(1, 101))  # All 100 pages (~3000 listings)
-                
-                # Scrape pages in parallel
-                listings = await self.scrape_multiple_pages_parallel(keyword, place, pages_to_test)
-                
-                if listings:
-                    self.all_results.extend(listings)
-                    
-                    # Save progress
-                    timestamp = datetime.now().strftime("%H%M%S")
-                    progress_file = f"multi_session_progress_{timestamp}.csv"
-                    self.save_results(listings, progress_file)
-                    
-                    elapsed = time.time() - start_time
-                    
-                    print(f"\nRESULTS FOR '{keyword}' in {place}:")
-                    print(f"Time taken: {elapsed:.1f} seconds")
-                    print(f"Listings found: {len(listings)}")
-                    print(f"Total pages scraped: {len(pages_to_test)}")
-                    print(f"Saved to: {progress_file}")
-                
-                # Delay between keyword-place combinations
-                delay = random.uniform(30, 60)
-                print(f"Waiting {delay:.1f}s before next combination...")
-                await asyncio.sleep(delay)
-        
-        # Final save and webhook
-        if self.all_results:
-            final_filename = f"multi_session_final_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            self.save_results(self.all_results, final_filename)
-            
-            # Send to N8N webhook
-            print("Sending results to N8N webhook...")
-            self.send_to_webhook(self.all_results, final_filename)
-            self.send_csv_to_webhook(final_filename)
-            
+        self.sink = CsvSink(prefix=self.output_prefix, max_bytes=int(self.max_file_mb * 1024 * 1024),
+                            fieldnames=fieldnames, on_flush=self.checkpoint.record_pages, metrics=self.metrics)
+        await self.sink.start()
+        if self.page_cache_path:
+            self.page_cache = PageCache(self.page_cache_path, ttl=self.cache_ttl_hours * 3600,
+                                        max_bytes=int(self.cache_max_mb * 1024 * 1024))
+        await self.start_metrics()
+        if self.webhook_url:
+            self.webhook = WebhookSender(
+                self.webhook_url,
+                run_id=f"{self.output_prefix}_{self.sink.timestamp}",
+                batch_size=self.webhook_batch_size,
+                flush_interval=self.webhook_interval,
+                spool_dir=self.webhook_spool,
+                metadata={'timezone': self.timezone},
+                metrics=self.metrics
+            )
+            await self.webhook.start()
+        self.proxy_manager.start_refresh()
+        self.supervisor.start()
+        
+        try:
+            if shard_queue is None:
+                await self.scrape_all_combinations(keywords, places)
+            else:
+                await self.scrape_shards(shard_queue, worker_id)
+        finally:
+            await self.proxy_manager.stop_refresh()
+            await self.sink.close()
+            if self.webhook:
+                await self.webhook.close()
+            if shard_queue is not None:
+                for filename in self.sink.files:
+                    shard_queue.register_output(filename, worker_id)
+            logging.info(f"Checkpoint {self.checkpoint_path}: {self.checkpoint.summary()}")
+            self.checkpoint.close()
+            self.dedup.save()
+            if self.lead_store:
+                logging.info(f"Lead store {self.delta_path}: {self.lead_store.summary()}")
+                self.lead_store.close()
+            if self.page_cache:
+                logging.info(f"Page cache: {self.page_cache.summary()}")
+                self.page_cache.close()
+            if self.browser_pool:
+                await self.browser_pool.close()
+                self.browser_pool = None
+            await self.supervisor.stop()
+            if self.http_fetcher:
+                await self.http_fetcher.close()
+            await self.metrics.stop()
+            metrics_report = f"{self.output_prefix}_{self.sink.timestamp}_metrics.json"
+            self.metrics.write_report(metrics_report)
+        
+        if self.sink.rows_written:
             print(f"\n{'='*70}")
             print("MULTI-SESSION SCRAPING COMPLETED!")
             print(f"{'='*70}")
-            print(f"Total listings collected: {len(self.all_results)}")
-            print(f"Final results saved to: {final_filename}")
-            print(f"Results sent to N8N webhook: {len(self.all_results)} listings")
-            print(f"Average listings per page: {len(self.all_results)/100:.1f}")
+            print(f"Total listings collected: {self.sink.rows_written}")
+            print(f"Duplicate listings dropped: {self.dedup.duplicates}")
+            if self.lead_store:
+                print(f"Leads since the last run: {self.lead_store.summary()}")
+            print(f"Browser requests: {self.resource_filter.totals.summary()}")
+            print(f"Cloudflare clearance: {self.clearances.summary()}")
+            print(f"Concurrency: {self.concurrency.summary()}")
+            print(f"Browsers: {self.supervisor.summary()}")
+            print(f"Final results saved to: {', '.join(self.sink.files)}")
+            if self.webhook:
+                print(f"Results sent to N8N webhook: {self.webhook.summary()}")
+            print(f"Stage timings and counters: {metrics_report}")
+            print(f"Average listings per page: {self.sink.rows_written/max(1, self.pages_scraped):.1f}")
+    
+    async def run_worker_processes(self, shard_queue, queue_path, workers, options):
+        """Start `workers` worker processes on the queue and wait for all of them"""
+        host = socket.gethostname()
+        context = multiprocessing.get_context('spawn')
+        processes = {}
+        for index in range(workers):
+            worker_id = f"{host}-{index}"
+            worker_options = dict(
+                options,
+                output_prefix=f"multi_session_{worker_id}",
+                checkpoint_path=f"{os.path.splitext(self.timezone_file)[0]}_{worker_id}_checkpoint.db",
+                dedup_path=None,
+                # Slices come from the queue, so workers on other machines get different ones
+                proxy_shard=shard_queue.proxy_slice(worker_id, workers),
+                # Each worker serves its own metrics on the next port up
+                metrics_port=options['metrics_port'] + 1 + index if options.get('metrics_port') else None,
+            )
+            process = context.Process(
+                target=run_shard_worker,
+                args=(queue_path, worker_id, self.timezone_file, worker_options),
+                name=f"scraper-{worker_id}"
+            )
+            process.start()
+            processes[worker_id] = process
+        logging.info(f"Started {workers} worker processes on {queue_path}")
+        
+        for worker_id, process in processes.items():
+            await asyncio.to_thread(process.join)
+            if process.exitcode != 0:
+                released = shard_queue.release(worker_id)
+                logging.error(f"Worker {worker_id} exited with code {process.exitcode}, requeued {released} shards")
+    
+    async def run_sharded(self, options, workers, queue_path, join=False, keywords=None, places=None, proxy_slices=None):
+        """Split the keyword-place combinations across worker processes.
+        
+        Each process runs its own MultiSessionScraper (browser pool, sink,
+        checkpoint and slice of the proxy list) and pulls combinations from
+        the ShardQueue at `queue_path`. Coordinators on other machines can
+        add their own workers with `join=True`; the one that filled the
+        queue waits for every shard, then merges the workers' CSVs into the
+        usual output parts, dropping listings found by more than one worker.
+        Workers stream to the webhook as they go, so a listing two workers
+        both found reaches it twice.
+        
+        The proxy list is split into `proxy_slices` slices (default: this
+        host's `workers`), handed out by the queue to workers of every host;
+        with joined hosts, set it to the total worker count of the run.
+        """
+        shard_queue = ShardQueue(queue_path)
+        # Workers sharing a lead store judge removals against one run start
+        options = dict(options, delta_started_at=time.time())
+        try:
+            if not join:
+                keywords, places = self.load_search_terms(keywords, places)
+                if self.resume:
+                    # Nobody is working on the queue yet, so running shards were abandoned
+                    shard_queue.release_all()
+                else:
+                    shard_queue.reset()
+                shard_queue.populate(keywords, places)
+                shard_queue.set_proxy_slices(proxy_slices or workers)
+            logging.info(f"Shard queue {queue_path}: {shard_queue.summary()}")
+            
+            for _ in range(MAX_WORKER_ROUNDS):
+                await self.run_worker_processes(shard_queue, queue_path, workers, options)
+                if join:
+                    return
+                # Shards may still be held by workers on other machines
+                while shard_queue.summary().get('running') and not shard_queue.summary().get('pending'):
+                    await asyncio.sleep(HEARTBEAT_INTERVAL)
+                    shard_queue.requeue_stale()
+                if not shard_queue.summary().get('pending'):
+                    break
+                logging.warning(f"{shard_queue.summary().get('pending')} shards left unfinished, starting workers again")
+            
+            summary = shard_queue.summary()
+            self.sink = await merge_outputs(shard_queue.outputs(), self.dedup, max_bytes=int(self.max_file_mb * 1024 * 1024),
+                                            prefix=self.output_prefix,
+                                            fieldnames=FIELDNAMES + DELTA_FIELDS if self.delta_path else FIELDNAMES)
+            self.dedup.save()
+        finally:
+            shard_queue.close()
+        
+        print(f"\n{'='*70}")
+        print(f"SHARDED SCRAPING COMPLETED: {workers} workers per host")
+        print(f"{'='*70}")
+        print(f"Shards: {summary}")
+        print(f"Total listings collected: {self.sink.rows_written}")
+        print(f"Cross-shard duplicates dropped: {self.dedup.duplicates}")
+        print(f"Final results saved to: {', '.join(self.sink.files)}")
+
+
+def run_shard_worker(queue_path, worker_id, timezone_file, options):
+    """Entry point of a worker process: scrape shards from the queue until it is empty"""
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - {worker_id} - %(levelname)s - %(message)s', force=True)
+    scraper = MultiSessionScraper(timezone_file, **options)
+    shard_queue = ShardQueue(queue_path)
+    try:
+        asyncio.run(scraper.run_multi_session_scraper(shard_queue=shard_queue, worker_id=worker_id))
+    finally:
+        shard_queue.close()
 
 def main():
     # Check command line arguments
-    timezone_file = 'pst.csv'  # default
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('timezone', nargs='?', default='pst', help='Timezone file: pst, est, cst or mst')
+    argparser.add_argument('--engine', choices=['hybrid', 'browser'], default='hybrid',
+                           help="'hybrid' fetches over plain HTTP and uses a browser only for Cloudflare challenges")
+    argparser.add_argument('--browser-mode', choices=['pool', 'session'], default='pool',
+                           help="'pool' reuses long-lived browsers, 'session' launches one browser per page")
+    argparser.add_argument('--pool-size', type=int, default=5,
+                           help='Number of pooled browsers, and the pages in flight at start')
+    argparser.add_argument('--min-concurrency', type=int, default=1, help='Fewest pages in flight when backing off')
+    argparser.add_argument('--max-concurrency', type=int,
+                           help='Most pages in flight while the site keeps up (default: 4 x pool size; '
+                                'at most the pool size with --engine browser in pool mode)')
+    argparser.add_argument('--max-memory-percent', type=float, default=85.0,
+                           help='Back off concurrency while host memory use is above this')
+    argparser.add_argument('--pages-per-context', type=int, default=10,
+                           help='Pages served by a pooled browser context before it is recycled')
+    argparser.add_argument('--max-pages', type=int, default=MAX_PAGES, help='Upper bound on result pages per search')
+    argparser.add_argument('--empty-page-limit', type=int, default=3,
+                           help='Consecutive empty pages after which the remaining pages are cancelled')
+    argparser.add_argument('--proxy-interval', type=float, default=5.0, help='Minimum seconds between requests on one proxy')
+    argparser.add_argument('--host-interval', type=float, default=0.5, help='Minimum seconds between requests to Yellow Pages')
+    argparser.add_argument('--browser-max-rss-mb', type=float, default=1024,
+                           help='Replace a browser whose process tree uses more memory than this')
+    argparser.add_argument('--browser-max-pages', type=int, default=200,
+                           help='Replace a pooled browser after this many pages')
+    argparser.add_argument('--page-deadline', type=float, default=180,
+                           help='Kill a browser stuck on one page for longer than this many seconds')
+    argparser.add_argument('--ready-timeout', type=float, default=15.0,
+                           help='Longest wait in seconds for listings to render after navigation')
+    argparser.add_argument('--resume', action='store_true',
+                           help='Skip pages a previous run completed and retry only the failed or empty ones')
+    argparser.add_argument('--checkpoint', help='Checkpoint database (default: <timezone>_checkpoint.db)')
+    argparser.add_argument('--dedup-file', help='Persist the duplicate-listing index here to dedupe across runs')
+    argparser.add_argument('--dedup-max-entries', type=int, default=1_000_000,
+                           help='Listing keys remembered for deduplication (about 70 bytes each)')
+    argparser.add_argument('--block-types', default=','.join(DEFAULT_BLOCKED_TYPES),
+                           help="Comma-separated browser resource types to block ('' blocks third-party requests only)")
+    argparser.add_argument('--direct', action='store_true', help='Connect without proxies')
+    argparser.add_argument('--proxy-refresh-minutes', type=float, default=30,
+                           help='Re-download the proxy list in the background this often (0 disables)')
+    argparser.add_argument('--proxy-cache', default='proxy_list_cache.txt',
+                           help="Proxy list kept between runs; used at startup instead of waiting on a download ('' disables)")
+    argparser.add_argument('--max-file-mb', type=float, default=50, help='Start a new output CSV part past this size')
+    argparser.add_argument('--webhook-batch-size', type=int, default=500, help='Listings per webhook batch')
+    argparser.add_argument('--webhook-interval', type=float, default=30.0,
+                           help='Send a partial webhook batch after this many seconds')
+    argparser.add_argument('--webhook-spool', default='webhook_spool',
+                           help='Directory for webhook batches that could not be delivered, resent later')
+    argparser.add_argument('--page-cache', default='page_cache.db',
+                           help="Cache of fetched result pages reused by later runs ('' disables)")
+    argparser.add_argument('--cache-ttl-hours', type=float, default=168,
+                           help='Cached pages younger than this are used instead of fetching again')
+    argparser.add_argument('--cache-max-mb', type=float, default=500,
+                           help='Evict least recently used pages once the compressed cache exceeds this size')
+    argparser.add_argument('--delta', metavar='LEAD_STORE',
+                           help='Lead database of earlier runs; output only new, changed and removed leads')
+    argparser.add_argument('--metrics-port', type=int,
+                           help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics (JSON at /report)')
+    argparser.add_argument('--workers', type=int, default=1,
+                           help='Worker processes, each with its own browser pool and slice of the proxies')
+    argparser.add_argument('--queue', help='Shard queue database shared by the workers (default: <timezone>_shards.db)')
+    argparser.add_argument('--join', action='store_true',
+                           help="Add this machine's workers to a queue another coordinator filled and will merge")
+    argparser.add_argument('--proxy-slices', type=int,
+                           help='Slices the proxy list is split into for the workers of every host '
+                                '(default: --workers of the coordinator filling the queue)')
+    args = argparser.parse_args()
     
-    if len(sys.argv) > 1:
-        timezone_file = sys.argv[1]
-        if not timezone_file.endswith('.csv'):
-            timezone_file = f"{timezone_file}.csv"
+    timezone_file = args.timezone
+    if not timezone_file.endswith('.csv'):
+        timezone_file = f"{timezone_file}.csv"
     
     # Validate timezone file exists
     if not os.path.exists(timezone_file):
@@ -439,7 +938,53 @@ def main():
         return
     
     print(f"Starting scraper with timezone file: {timezone_file}")
-    scraper = MultiSessionScraper(timezone_file)
+    options = dict(
+        browser_mode=args.browser_mode,
+        pool_size=args.pool_size,
+        min_concurrency=args.min_concurrency,
+        max_concurrency=args.max_concurrency,
+        max_memory_percent=args.max_memory_percent,
+        pages_per_context=args.pages_per_context,
+        max_pages=args.max_pages,
+        empty_page_limit=args.empty_page_limit,
+        proxy_interval=args.proxy_interval,
+        host_interval=args.host_interval,
+        engine=args.engine,
+        max_file_mb=args.max_file_mb,
+        checkpoint_path=args.checkpoint,
+        resume=args.resume,
+        dedup_path=args.dedup_file,
+        dedup_max_entries=args.dedup_max_entries,
+        proxy_refresh_minutes=args.proxy_refresh_minutes,
+        proxy_cache=args.proxy_cache or None,
+        ready_timeout=args.ready_timeout,
+        browser_max_rss_mb=args.browser_max_rss_mb,
+        browser_max_pages=args.browser_max_pages,
+        page_deadline=args.page_deadline,
+        blocked_types=[kind.strip() for kind in args.block_types.split(',') if kind.strip()],
+        direct=args.direct,
+        webhook_batch_size=args.webhook_batch_size,
+        webhook_interval=args.webhook_interval,
+        webhook_spool=args.webhook_spool,
+        metrics_port=args.metrics_port,
+        page_cache_path=args.page_cache or None,
+        cache_ttl_hours=args.cache_ttl_hours,
+        cache_max_mb=args.cache_max_mb,
+        delta_path=args.delta
+    )
+    
+    # A look on disk; `playwright install` only runs if Chromium is missing
+    ensure_chromium()
+    
+    if args.workers > 1 or args.queue or args.join:
+        # The coordinator only hands out work and merges; workers load their own proxies
+        coordinator = MultiSessionScraper(timezone_file, proxy_manager=ProxyManager(refresh_interval=0), **options)
+        queue_path = args.queue or f"{os.path.splitext(timezone_file)[0]}_shards.db"
+        asyncio.run(coordinator.run_sharded(options, args.workers, queue_path, join=args.join,
+                                                 proxy_slices=args.proxy_slices))
+        return
+    
+    scraper = MultiSessionScraper(timezone_file, **options)
     asyncio.run(scraper.run_multi_session_scraper())
 
 if __name__ == '__main__':
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+import zlib
+import sqlite3
+import logging
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+"""
+
+
+def normalize_search_url(url):
+    """Cache key of a search URL: lowercase host, sorted query, case- and whitespace-folded terms"""
+    parts = urlsplit(url)
+    query = sorted((name, ' '.join(value.split()).casefold()) for name, value in parse_qsl(parts.query))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', urlencode(query), ''))
+
+
+class PageCache:
+    """Disk cache of fetched search result pages, shared by runs and worker processes.
+
+    Pages are stored zlib-compressed in SQLite under their normalized URL,
+    as raw HTML, so a cached page is parsed exactly like a fresh one.
+    Entries older than `ttl` seconds are treated as missing and dropped.
+    Once the compressed pages take more than `max_bytes`, the least
+    recently used ones are evicted.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_bytes=500 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        # Worker processes share the file; wait out each other's writes
+        self.conn.execute('PRAGMA busy_timeout=10000')
+        self.conn.executescript(SCHEMA)
+        with self.conn:
+            self.conn.execute('DELETE FROM pages WHERE stored_at < ?', (time.time() - self.ttl,))
+        self.total_bytes = self._stored_bytes()
+
+    def _stored_bytes(self):
+        return self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+
+    def get(self, url):
+        """(status, html) of a fresh cached page, or None"""
+        key = normalize_search_url(url)
+        now = time.time()
+        row = self.conn.execute('SELECT status, body, stored_at FROM pages WHERE url = ?', (key,)).fetchone()
+        if row is None or row[2] < now - self.ttl:
+            self.misses += 1
+            return None
+        with self.conn:
+            self.conn.execute('UPDATE pages SET accessed_at = ? WHERE url = ?', (now, key))
+        self.hits += 1
+        return row[0], zlib.decompress(row[1]).decode('utf-8')
+
+    def put(self, url, html_text, status=200):
+        body = zlib.compress(html_text.encode('utf-8'), 6)
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO pages (url, status, body, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    status = excluded.status,
+                    body = excluded.body,
+                    size = excluded.size,
+                    stored_at = excluded.stored_at,
+                    accessed_at = excluded.accessed_at
+                """,
+                (normalize_search_url(url), status, body, len(body), now, now)
+            )
+        self.stored += 1
+        self.total_bytes += len(body)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used pages until the cache is back under 90% of max_bytes"""
+        # Other processes write to the same file: start from the real total
+        self.total_bytes = self._stored_bytes()
+        target = self.max_bytes * 0.9
+        doomed = []
+        for key, size in self.conn.execute('SELECT url, size FROM pages ORDER BY accessed_at'):
+            if self.total_bytes <= target:
+                break
+            doomed.append((key,))
+            self.total_bytes -= size
+        with self.conn:
+            self.conn.executemany('DELETE FROM pages WHERE url = ?', doomed)
+        self.evicted += len(doomed)
+        logging.info(f"Page cache: evicted {len(doomed)} pages, {self.total_bytes / 1024 / 1024:.1f} MB left")
+
+    def summary(self):
+        return (
+            f"{self.hits} hits, {self.misses} misses, {self.stored} pages stored, {self.evicted} evicted, "
+            f"{self.total_bytes / 1024 / 1024:.1f} MB in {self.path}"
+        )
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception as e:
+            logging.warning(f"Error closing page cache {self.path}: {e}")
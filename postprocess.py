@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Batch clean-up of scraped lead CSVs, a whole column at a time.
+
+Adds E.164 phones, the address split into street, city, state and ZIP, a
+placeholder-address flag and a lead score to the output of either
+scraper. Runs on finished CSVs, in chunks so any size fits in memory:
+
+    python postprocess.py multi_session_final_20250101_120000_part001.csv
+    python postprocess.py *-yellowpages-scraped-data.csv --suffix _clean --chunksize 500000
+"""
+
+import os
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+
+# Optional street, then city and "ST 12345". Yellow Pages addresses come
+# comma-separated, city-only ("Lancaster, CA 93535") or with the street
+# glued to the locality ("123 Main StSan Diego, CA 92101", "12 Oak Rd Ste
+# BDiamond Bar, CA 91765"). City words never hold a lowercase-to-uppercase
+# step or two capitals before a lowercase letter, which is what marks the
+# glue point.
+_CITY_WORD = r"[A-Za-z][a-z.'-]*(?:['-][A-Z][a-z]+)*"
+ADDRESS_PATTERN = (
+    r'^\s*(?:(?P<Street>.*?)(?:,\s*|(?<=[a-z0-9.")])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])))?'
+    rf"(?P<City>[A-Z][a-z.'-]*(?:['-][A-Z][a-z]+)*(?:\s+{_CITY_WORD})*)"
+    r",?\s+(?P<State>[A-Z]{2})(?:\s+(?P<ZIP>\d{5})(?:-\d{4})?)?\s*$"
+)
+
+# Stand-ins listed instead of a street by service-area businesses
+PLACEHOLDER_PATTERN = r"(?i)^\s*(?:serving\b|service area|call for|by appointment|mobile\b|none\b|n/?a\b|$)"
+
+# Points per quality signal; a lead with all of them scores 100
+SCORE_WEIGHTS = {
+    'phone': 35,
+    'street': 25,
+    'zip': 10,
+    'website': 20,
+    'category': 10,
+}
+
+ADDED_COLUMNS = ['PhoneE164', 'Street', 'City', 'State', 'ZIP', 'PlaceholderAddress', 'LeadScore']
+
+
+def per_distinct(values, transform):
+    """`transform` applied once per distinct value and spread back over every row.
+
+    Ads repeat on every page of a search, so scraped columns hold far fewer
+    distinct values than rows and the string work is done only for those.
+    """
+    codes, uniques = pd.factorize(values)
+    result = transform(pd.Series(uniques, dtype=object))
+    return result.iloc[codes].set_axis(values.index)
+
+
+def normalize_phones(phones):
+    """US numbers as +1XXXXXXXXXX; anything that is not 10 digits (11 with a leading 1) becomes ''"""
+    return per_distinct(phones.fillna('').astype(str), _e164)
+
+
+def _e164(phones):
+    digits = phones.str.replace(r'\D', '', regex=True)
+    digits = digits.where(~((digits.str.len() == 11) & digits.str.startswith('1')), digits.str[1:])
+    # North American numbers never start their area code or exchange with 0 or 1
+    valid = digits.str.fullmatch(r'[2-9]\d{2}[2-9]\d{6}')
+    return ('+1' + digits).where(valid, '')
+
+
+def full_addresses(frame):
+    """One address string per row, whichever scraper wrote the CSV"""
+    addresses = frame.get('Address', pd.Series('', index=frame.index)).fillna('').astype(str)
+    if 'BusinessName' in frame.columns and 'Location' in frame.columns:
+        # ScrapMultipleLocations keeps the locality ("City ST 12345") in its own column
+        addresses = addresses.str.cat(frame['Location'].fillna('').astype(str), sep=', ')
+    return addresses
+
+
+def split_addresses(addresses):
+    """Street, City, State and ZIP columns; rows that do not parse keep the whole text as Street"""
+    return per_distinct(addresses, _split)
+
+
+def _split(addresses):
+    parts = addresses.str.extract(ADDRESS_PATTERN)
+    unparsed = parts['City'].isna()
+    parts.loc[unparsed, 'Street'] = addresses[unparsed]
+    parts = parts.fillna('')
+    parts['Street'] = parts['Street'].str.strip().str.rstrip(',').str.strip()
+    return parts
+
+
+def score_leads(phones, streets, cities, placeholder, zips, websites, categories):
+    """0-100 from the SCORE_WEIGHTS signals each lead has; only a street that parsed counts"""
+    score = np.zeros(len(phones), dtype=np.int16)
+    score += np.where(phones != '', SCORE_WEIGHTS['phone'], 0).astype(np.int16)
+    score += np.where((streets != '') & (cities != '') & ~placeholder, SCORE_WEIGHTS['street'], 0).astype(np.int16)
+    score += np.where(zips.str.fullmatch(r'\d{5}') & (zips != '00000'), SCORE_WEIGHTS['zip'], 0).astype(np.int16)
+    score += np.where(websites != '', SCORE_WEIGHTS['website'], 0).astype(np.int16)
+    score += np.where(categories != '', SCORE_WEIGHTS['category'], 0).astype(np.int16)
+    return score
+
+
+def process_frame(frame):
+    """The frame with ADDED_COLUMNS filled in, every step vectorized over the column"""
+    frame = frame.copy()
+    empty = pd.Series('', index=frame.index)
+    frame['PhoneE164'] = normalize_phones(frame.get('Phone', empty))
+
+    parts = split_addresses(full_addresses(frame))
+    for column in ('Street', 'City', 'State', 'ZIP'):
+        frame[column] = parts[column]
+    frame['PlaceholderAddress'] = frame['Street'].str.contains(PLACEHOLDER_PATTERN, regex=True)
+
+    # The place scraper calls the category column Industry and has no websites
+    categories = frame.get('Category', frame.get('Industry', empty)).fillna('').astype(str).str.strip()
+    websites = frame.get('Website', empty).fillna('').astype(str).str.strip()
+    frame['LeadScore'] = score_leads(frame['PhoneE164'], frame['Street'], frame['City'], frame['PlaceholderAddress'],
+                                     frame['ZIP'], websites, categories)
+    return frame
+
+
+def output_path(path, suffix='_clean'):
+    root, ext = os.path.splitext(path)
+    return f"{root}{suffix}{ext or '.csv'}"
+
+
+def process_csv(path, output=None, chunksize=200_000):
+    """Clean one CSV chunk by chunk into `output` (default <name>_clean.csv); returns (output, rows)"""
+    output = output or output_path(path)
+    rows = 0
+    start_time = time.perf_counter()
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize):
+            process_frame(chunk).to_csv(f, index=False, header=rows == 0)
+            rows += len(chunk)
+    os.replace(tmp_path, output)
+    elapsed = time.perf_counter() - start_time
+    logging.info(f"Post-processed {rows} rows of {path} into {output} in {elapsed:.1f}s "
+                 f"({rows / max(elapsed, 0.001):,.0f} rows/s)")
+    return output, rows
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Normalize phones and addresses and score leads in scraped CSVs')
+    argparser.add_argument('csv_files', nargs='+', help='Scraper output CSVs')
+    argparser.add_argument('--suffix', default='_clean', help='Appended to each input name for its output file')
+    argparser.add_argument('--chunksize', type=int, default=200_000, help='Rows processed at a time')
+    args = argparser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for path in args.csv_files:
+        process_csv(path, output_path(path, args.suffix), chunksize=args.chunksize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import os
+import random
+import time
+import requests
+
+PROXY_LIST_URL = 'https://proxy.webshare.io/api/v2/proxy/list/download/qmdbkedkgvtgrenpwvkkqezvxftqmwtcgcpkcquu/-/any/sourceip/direct/-/?plan_id=10580741'
+
+# Weight of the newest outcome in each moving average
+EWMA_ALPHA = 0.2
+# Latency assumed for a proxy that has not been used yet
+DEFAULT_LATENCY = 5.0
+# Weight multiplier for proxies passed in `prefer` (e.g. holding a Cloudflare
+# clearance): favoured, but not so much that a few proxies take all traffic
+PREFER_BOOST = 4.0
+# Attempts at the first download when there is no cached list to start from
+DOWNLOAD_ATTEMPTS = 3
+
+
+def parse_proxy_list(text):
+    """Turn a host:port per line download into Playwright proxy dicts"""
+    proxies = []
+    for line in text.split('\n'):
+        if ':' in line.strip():
+            host, port = line.strip().split(':')[:2]
+            proxies.append({'server': f'http://{host}:{port}', 'id': f'{host}:{port}'})
+    return proxies
+
+
+class ProxyStats:
+    """Moving averages of one proxy's recent outcomes"""
+
+    def __init__(self):
+        self.success_rate = 1.0
+        self.challenge_rate = 0.0
+        self.latency = DEFAULT_LATENCY
+        self.uses = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def weight(self):
+        # Reliable, unchallenged, fast proxies get picked the most; nobody
+        # drops to zero so a proxy can always earn its way back
+        return max(0.01, self.success_rate * (1 - self.challenge_rate) / max(self.latency, 0.5))
+
+
+class ProxyManager:
+    """Health-scored proxy selection.
+
+    Tracks success rate, Cloudflare challenge rate and latency per proxy and
+    picks proxies at random weighted by those scores. A proxy that fails
+    `failure_threshold` times in a row is put on a cooldown that doubles
+    with each further failure, up to `max_cooldown` seconds. The list is
+    re-downloaded every `refresh_interval` seconds in the background. With
+    `shard=(index, count)` only every count-th proxy of the list, starting at
+    `index`, is used, so parallel worker processes given distinct indexes
+    (see ShardQueue.proxy_slice) never share a proxy.
+
+    Every download is saved to `cache_path`. `load` starts from that file
+    without touching the network; a copy older than `cache_ttl` seconds is
+    still used, and refreshed in the background as soon as `start_refresh`
+    is called. Only without any cached copy does `load` wait on a download.
+    """
+
+    def __init__(self, list_url=PROXY_LIST_URL, refresh_interval=1800, failure_threshold=2,
+                 base_cooldown=60, max_cooldown=1800, shard=None, cache_path=None, cache_ttl=1800):
+        self.list_url = list_url
+        self.shard = shard
+        self.cache_path = cache_path
+        self.cache_ttl = cache_ttl
+        self.refresh_interval = refresh_interval
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.proxies = []
+        self.stats = {}
+        self._refresher = None
+        self._refresh_due = False
+
+    def _slice(self, proxies):
+        if self.shard and proxies:
+            index, count = self.shard
+            # Too few proxies to go around: workers have to share
+            proxies = proxies[index::count] if len(proxies) >= count else [proxies[index % len(proxies)]]
+        return proxies
+
+    def _download(self):
+        response = requests.get(self.list_url, timeout=30)
+        response.raise_for_status()
+        proxies = parse_proxy_list(response.text)
+        if proxies and self.cache_path:
+            # Worker processes share the cache: replace it in one step
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(response.text)
+            os.replace(tmp_path, self.cache_path)
+        return self._slice(proxies)
+
+    def _read_cache(self):
+        """(proxies, age in seconds) from the cache file, or (None, None)"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None, None
+        with open(self.cache_path, 'r', encoding='utf-8') as f:
+            proxies = parse_proxy_list(f.read())
+        return self._slice(proxies) or None, time.time() - os.path.getmtime(self.cache_path)
+
+    def set_proxies(self, proxies):
+        """Replace the proxy list, keeping the stats of proxies still on it"""
+        self.proxies = proxies
+        self.stats = {proxy['id']: self.stats.get(proxy['id']) or ProxyStats() for proxy in proxies}
+
+    def load(self):
+        try:
+            cached, age = self._read_cache()
+        except Exception as e:
+            logging.warning(f"Unreadable proxy cache {self.cache_path}: {e}")
+            cached = None
+        if cached:
+            self.set_proxies(cached)
+            self._refresh_due = age > self.cache_ttl
+            logging.info(f"Loaded {len(self.proxies)} proxies from {self.cache_path} ({age / 60:.0f} min old"
+                         f"{', refreshing in the background' if self._refresh_due else ''})")
+            return self.proxies
+
+        for attempt in range(DOWNLOAD_ATTEMPTS):
+            try:
+                self.set_proxies(self._download())
+                logging.info(f"Loaded {len(self.proxies)} proxies")
+                break
+            except Exception as e:
+                logging.error(f"Failed to load proxy list (attempt {attempt + 1}/{DOWNLOAD_ATTEMPTS}): {e}")
+                if attempt + 1 < DOWNLOAD_ATTEMPTS:
+                    time.sleep(2 ** attempt)
+        return self.proxies
+
+    def is_available(self, proxy_id):
+        stats = self.stats.get(proxy_id)
+        return stats is not None and stats.cooldown_until <= time.monotonic()
+
+    def pick(self, exclude=(), prefer=()):
+        """Weighted random proxy off cooldown; None when there are no proxies.
+
+        Proxies in `prefer` have their weight multiplied by PREFER_BOOST. If
+        every proxy is cooling down, the one that comes back soonest is used.
+        """
+        if not self.proxies:
+            return None
+        now = time.monotonic()
+        candidates = [p for p in self.proxies if p['id'] not in exclude and self.stats[p['id']].cooldown_until <= now]
+        if not candidates:
+            return min(self.proxies, key=lambda p: self.stats[p['id']].cooldown_until)
+        weights = [self.stats[p['id']].weight * (PREFER_BOOST if p['id'] in prefer else 1.0) for p in candidates]
+        return random.choices(candidates, weights=weights)[0]
+
+    def pick_many(self, count):
+        """Up to `count` distinct proxies by weight, repeating only if there are too few"""
+        picked = []
+        for _ in range(count):
+            proxy = self.pick(exclude={p['id'] for p in picked})
+            if proxy is None:
+                break
+            picked.append(proxy)
+        return picked
+
+    def record(self, proxy_id, outcome, latency=None):
+        """Feed back a request outcome: 'ok', 'challenge' or 'failed'"""
+        stats = self.stats.get(proxy_id)
+        if stats is None:
+            return
+
+        stats.uses += 1
+        stats.success_rate += EWMA_ALPHA * ((outcome == 'ok') - stats.success_rate)
+        stats.challenge_rate += EWMA_ALPHA * ((outcome == 'challenge') - stats.challenge_rate)
+        if latency is not None:
+            stats.latency += EWMA_ALPHA * (latency - stats.latency)
+
+        if outcome == 'ok':
+            stats.consecutive_failures = 0
+            return
+
+        stats.consecutive_failures += 1
+        if stats.consecutive_failures >= self.failure_threshold:
+            cooldown = min(self.max_cooldown, self.base_cooldown * 2 ** (stats.consecutive_failures - self.failure_threshold))
+            stats.cooldown_until = time.monotonic() + cooldown
+            logging.warning(f"Proxy {proxy_id}: {stats.consecutive_failures} failures in a row, cooling down for {cooldown:.0f}s")
+
+    async def _refresh_periodically(self):
+        while True:
+            if not self._refresh_due:
+                await asyncio.sleep(self.refresh_interval)
+            self._refresh_due = False
+            try:
+                proxies = await asyncio.to_thread(self._download)
+                if not proxies:
+                    raise ValueError("empty proxy list")
+                self.set_proxies(proxies)
+                logging.info(f"Refreshed proxy list: {len(self.proxies)} proxies")
+            except Exception as e:
+                logging.warning(f"Proxy list refresh failed, keeping {len(self.proxies)} proxies: {e}")
+            if self.refresh_interval <= 0:
+                # Only here for the stale cache: no periodic refresh wanted
+                return
+
+    def start_refresh(self):
+        if self._refresher is None and (self.refresh_interval > 0 or self._refresh_due):
+            self._refresher = asyncio.create_task(self._refresh_periodically())
+
+    async def stop_refresh(self):
+        if self._refresher:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import random
+
+
+class RateLimiter:
+    """Keyed rate limiter: at most one request per `interval` seconds per key.
+
+    Callers reserve the next free slot for their key and sleep until it comes
+    up, so concurrent waiters on the same key are spread out instead of
+    bursting. Keys are independent (e.g. one per proxy, one per host).
+    """
+
+    def __init__(self, interval, jitter=0.0):
+        self.interval = interval
+        self.jitter = jitter
+        self._next_slot = {}
+
+    async def wait(self, key):
+        if self.interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot.get(key, now))
+        self._next_slot[key] = slot + self.interval + random.uniform(0, self.jitter)
+        if slot > now:
+            await asyncio.sleep(slot - now)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import csv
+import logging
+import os
+from datetime import datetime
+from metrics import Metrics
+
+FIELDNAMES = ['Name', 'Phone', 'Address', 'Website', 'Category', 'Keyword', 'Location', 'TimeZone', 'IdStatus']
+
+
+class CsvSink:
+    """Append-only CSV output fed page by page as results arrive.
+
+    Rows are buffered and written in batches of `batch_size`, or every
+    `flush_interval` seconds by a background task, whichever comes first.
+    Once a file grows past `max_bytes` the next batch starts a new part, so
+    memory stays flat and a crash loses at most one unflushed batch. Tokens
+    passed along with rows are handed to `on_flush` once those rows are on
+    disk, so callers can checkpoint only what has really been saved.
+    """
+
+    def __init__(self, prefix='multi_session_final', fieldnames=FIELDNAMES, batch_size=500,
+                 flush_interval=5.0, max_bytes=50 * 1024 * 1024, preview_size=10, on_flush=None, metrics=None):
+        self.prefix = prefix
+        self.metrics = metrics or Metrics()
+        self.fieldnames = fieldnames
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.preview_size = preview_size
+        self.on_flush = on_flush
+        self.timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.files = []
+        self._part = 0
+        self.rows_written = 0
+        self.preview = []
+        self._buffer = []
+        self._tokens = []
+        self._file = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+        self._flusher = None
+
+    @property
+    def current_file(self):
+        return self.files[-1] if self.files else None
+
+    def _open_part(self):
+        # Another run started within the same second (a quick --resume) may
+        # already own this name: never append a second header to its file
+        while True:
+            self._part += 1
+            filename = f"{self.prefix}_{self.timestamp}_part{self._part:03d}.csv"
+            try:
+                self._file = open(filename, 'x', encoding='utf-8', newline='')
+                break
+            except FileExistsError:
+                logging.warning(f"{filename} already exists, moving on to the next part")
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+        self._writer.writeheader()
+        self.files.append(filename)
+        logging.info(f"Writing results to {filename}")
+
+    def _close_part(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def _write_batch(self, rows):
+        if self._file is None:
+            self._open_part()
+        self._writer.writerows(rows)
+        self._file.flush()
+        if os.path.getsize(self.current_file) >= self.max_bytes:
+            self._close_part()
+
+    async def start(self):
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"Error flushing results: {e}")
+
+    async def write(self, rows, token=None):
+        """Queue rows for writing; flushes once a full batch is buffered"""
+        if token is not None:
+            self._tokens.append(token)
+        if len(self.preview) < self.preview_size:
+            self.preview.extend(rows[:self.preview_size - len(self.preview)])
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._buffer and not self._tokens:
+                return
+            rows, self._buffer = self._buffer, []
+            tokens, self._tokens = self._tokens, []
+            if rows:
+                with self.metrics.timer('sink_write'):
+                    await asyncio.to_thread(self._write_batch, rows)
+                self.rows_written += len(rows)
+            if self.on_flush and tokens:
+                self.on_flush(tokens)
+
+    async def close(self):
+        if self._flusher:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+        self._close_part()
+        logging.info(f"Saved {self.rows_written} results to {len(self.files)} file(s)")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import inspect
+import itertools
+import logging
+import time
+
+# Follow-up pages of searches already under way run before new discoveries,
+# so combinations finish (and get saved) as early as possible
+FOLLOW_UP_PRIORITY = 0
+DISCOVERY_PRIORITY = 1
+
+
+def empty_run_start(empty_pages, run_length):
+    """First page of a run of `run_length` consecutive empty pages, if any"""
+    for page_num in sorted(empty_pages):
+        if all(page_num + offset in empty_pages for offset in range(run_length)):
+            return page_num
+    return None
+
+
+class Combination:
+    """Progress of one keyword-place search across its result pages"""
+
+    def __init__(self, keyword, place):
+        self.keyword = keyword
+        self.place = place
+        self.last_page = None
+        self.cutoff = None
+        self.outstanding = 0
+        self.empty_pages = set()
+        self.done_pages = set()
+        self.listing_count = 0
+        self.pages_scraped = 0
+        self.pages_ok = 0
+        self.pages_cancelled = 0
+        self.started_at = None
+
+    @property
+    def label(self):
+        return f"'{self.keyword}' in {self.place}"
+
+
+class JobScheduler:
+    """Feeds (keyword, place, page) jobs from every combination into one worker pool.
+
+    Each combination starts with a discovery job for page 1; its result sizes
+    the follow-up pages, which go onto the same shared queue. A combination
+    stops taking pages once `empty_page_limit` consecutive pages come back
+    empty. `scrape_page(keyword, place, page_num)` must return a page result
+    dict (see MultiSessionScraper.scrape_single_page). `on_page` is called
+    with each (combination, result) and `on_combination_done` as each
+    combination finishes; both are awaited if they are coroutines.
+
+    With a ConcurrencyController, `concurrency.ceiling` workers are started
+    and each takes a slot from the controller before taking a job, so the
+    pages in flight follow its current limit instead of `workers`.
+    """
+
+    def __init__(self, scrape_page, workers=5, max_pages=100, empty_page_limit=3, on_page=None,
+                 on_combination_done=None, concurrency=None):
+        self.scrape_page = scrape_page
+        self.concurrency = concurrency
+        self.workers = concurrency.ceiling if concurrency else workers
+        self.max_pages = max_pages
+        self.empty_page_limit = empty_page_limit
+        self.on_page = on_page
+        self.on_combination_done = on_combination_done
+        self.combinations = []
+        self._queue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+
+    def _enqueue(self, combination, page_num, priority=FOLLOW_UP_PRIORITY):
+        combination.outstanding += 1
+        self._queue.put_nowait((priority, next(self._sequence), combination, page_num))
+
+    def add_combination(self, keyword, place, pages=None, done_pages=(), last_page=None):
+        """Queue a search; with an explicit page list, page discovery is skipped.
+
+        `done_pages` (e.g. from a checkpoint) are never queued again; when page
+        1 is among them, `last_page` says how far the search goes.
+        """
+        combination = Combination(keyword, place)
+        combination.done_pages = set(done_pages)
+        self.combinations.append(combination)
+
+        if pages is None and last_page and 1 in combination.done_pages:
+            pages = range(1, last_page + 1)
+
+        if pages is None:
+            self._enqueue(combination, 1, DISCOVERY_PRIORITY)
+        else:
+            combination.last_page = max(pages, default=0)
+            for page_num in pages:
+                if page_num not in combination.done_pages:
+                    self._enqueue(combination, page_num)
+        return combination
+
+    def _record(self, combination, result):
+        page_num = result['page']
+        combination.pages_scraped += 1
+
+        if result['status'] == 'ok':
+            combination.listing_count += len(result['listings'])
+            combination.pages_ok += 1
+        elif result['status'] == 'empty':
+            combination.empty_pages.add(page_num)
+
+        if page_num == 1 and combination.last_page is None:
+            if result['status'] == 'empty':
+                logging.info(f"No results for {combination.label}")
+                return
+            # If page 1 failed the page count is unknown, so rely on early stop
+            combination.last_page = result['last_page'] or self.max_pages
+            logging.info(f"{combination.label}: {combination.last_page} result pages")
+            for follow_up in range(2, combination.last_page + 1):
+                if follow_up not in combination.done_pages:
+                    self._enqueue(combination, follow_up)
+
+        # Past the last real page every page is empty: stop paying for them
+        run_start = empty_run_start(combination.empty_pages, self.empty_page_limit)
+        if run_start is not None and (combination.cutoff is None or run_start < combination.cutoff):
+            combination.cutoff = run_start
+            logging.info(f"{combination.label}: pages {run_start}-{run_start + self.empty_page_limit - 1} empty, skipping later pages")
+
+    async def _notify(self, callback, *args):
+        if callback:
+            done = callback(*args)
+            if inspect.isawaitable(done):
+                await done
+
+    async def _finish_page(self, combination):
+        combination.outstanding -= 1
+        if combination.outstanding == 0:
+            await self._notify(self.on_combination_done, combination)
+
+    async def _worker(self):
+        while True:
+            if self.concurrency:
+                # Taking the slot first leaves the job in the queue, where a
+                # higher-priority follow-up can still overtake it
+                async with self.concurrency.slot():
+                    await self._run_job(await self._queue.get())
+            else:
+                await self._run_job(await self._queue.get())
+
+    async def _run_job(self, job):
+        _, _, combination, page_num = job
+        try:
+            if combination.cutoff is not None and page_num > combination.cutoff:
+                combination.pages_cancelled += 1
+            else:
+                if combination.started_at is None:
+                    combination.started_at = time.time()
+
+                # Pacing is left to the scrape function's rate limiters
+                try:
+                    result = await self.scrape_page(combination.keyword, combination.place, page_num)
+                    self._record(combination, result)
+                    await self._notify(self.on_page, combination, result)
+                except Exception as e:
+                    logging.error(f"{combination.label}: page {page_num} failed with exception: {e}")
+
+            await self._finish_page(combination)
+        except Exception as e:
+            logging.error(f"{combination.label}: error finishing page {page_num}: {e}")
+        finally:
+            self._queue.task_done()
+
+    async def run(self):
+        """Work through every queued job, then stop the workers"""
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            await self._queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
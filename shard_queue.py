@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import csv
+import os
+import socket
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+
+from result_sink import CsvSink, FIELDNAMES
+
+# Workers beat this often; a worker silent for STALE_AFTER seconds is presumed dead
+HEARTBEAT_INTERVAL = 30
+STALE_AFTER = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    keyword TEXT NOT NULL,
+    place TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_at TEXT,
+    finished_at TEXT,
+    PRIMARY KEY (keyword, place)
+);
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    heartbeat TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY,
+    worker TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS proxy_slices (
+    ordinal INTEGER PRIMARY KEY,
+    worker TEXT NOT NULL UNIQUE
+);
+"""
+
+
+class ShardQueue:
+    """SQLite queue of keyword-place combinations shared by worker processes.
+
+    Each combination is one shard: 'pending' until a worker claims it,
+    'running' while the worker scrapes it and 'done' once its listings are
+    on disk. Claims happen in an immediate transaction, so any number of
+    processes, on this machine or on others sharing the file over a
+    filesystem with working locks, can pull from the same queue. Workers
+    heartbeat while alive; shards held by a worker that stopped beating are
+    handed back by `requeue_stale`. Every worker registers its output files
+    so the coordinator can merge them at the end. Proxy list slices are
+    handed out here too, so workers on different machines never get the
+    same one.
+    """
+
+    def __init__(self, path, timeout=60):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def reset(self):
+        """Forget every shard, worker and output, for a run that starts from scratch"""
+        with self.conn:
+            self.conn.execute('DELETE FROM shards')
+            self.conn.execute('DELETE FROM workers')
+            self.conn.execute('DELETE FROM outputs')
+            self.conn.execute('DELETE FROM settings')
+            self.conn.execute('DELETE FROM proxy_slices')
+
+    def populate(self, keywords, places):
+        """Add every keyword-place combination not already queued; returns how many were added"""
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO shards (keyword, place) VALUES (?, ?)',
+                [(keyword, place) for place in places for keyword in keywords]
+            )
+            return self.conn.total_changes - before
+
+    def heartbeat(self, worker):
+        now = datetime.now().isoformat()
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO workers (worker, host, pid, heartbeat) VALUES (?, ?, ?, ?)
+                ON CONFLICT (worker) DO UPDATE SET host = excluded.host, pid = excluded.pid, heartbeat = excluded.heartbeat
+                """,
+                (worker, socket.gethostname(), os.getpid(), now)
+            )
+
+    def claim(self, worker):
+        """Atomically take the next pending shard; (keyword, place) or None when the queue is dry"""
+        now = datetime.now().isoformat()
+        # Take the write lock before reading so two workers never get the same shard
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute(
+                "SELECT keyword, place FROM shards WHERE status = 'pending' ORDER BY rowid LIMIT 1"
+            ).fetchone()
+            if row:
+                self.conn.execute(
+                    """
+                    UPDATE shards SET status = 'running', worker = ?, attempts = attempts + 1, claimed_at = ?
+                    WHERE keyword = ? AND place = ?
+                    """,
+                    (worker, now, row[0], row[1])
+                )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return row
+
+    def complete(self, keyword, place, worker):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE shards SET status = 'done', finished_at = ? WHERE keyword = ? AND place = ? AND worker = ?",
+                (datetime.now().isoformat(), keyword, place, worker)
+            )
+
+    def release(self, worker):
+        """Put a worker's unfinished shards back in the queue; returns how many"""
+        with self.conn:
+            return self.conn.execute(
+                "UPDATE shards SET status = 'pending', worker = NULL WHERE status = 'running' AND worker = ?",
+                (worker,)
+            ).rowcount
+
+    def requeue_stale(self, stale_after=STALE_AFTER):
+        """Hand back shards held by workers silent for `stale_after` seconds (or never seen)"""
+        cutoff = (datetime.now() - timedelta(seconds=stale_after)).isoformat()
+        with self.conn:
+            requeued = self.conn.execute(
+                """
+                UPDATE shards SET status = 'pending', worker = NULL
+                WHERE status = 'running' AND worker NOT IN (SELECT worker FROM workers WHERE heartbeat >= ?)
+                """,
+                (cutoff,)
+            ).rowcount
+        if requeued:
+            logging.warning(f"Requeued {requeued} shards from workers silent for over {stale_after}s")
+        return requeued
+
+    def release_all(self):
+        """Requeue every running shard, for a resumed run after all workers are gone"""
+        with self.conn:
+            return self.conn.execute(
+                "UPDATE shards SET status = 'pending', worker = NULL WHERE status = 'running'"
+            ).rowcount
+
+    def set_proxy_slices(self, count):
+        """Split the proxy list into `count` slices for all the workers of the run, on every host"""
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('proxy_slices', ?)", (str(count),))
+
+    def proxy_slice(self, worker, default_count):
+        """The (index, count) proxy slice of a worker; the same worker always gets the same one.
+
+        Slices go to workers in the order they ask, across every host. Once
+        there are more workers than slices, they have to share.
+        """
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute("SELECT value FROM settings WHERE name = 'proxy_slices'").fetchone()
+            count = int(row[0]) if row else default_count
+            if row is None:
+                self.conn.execute("INSERT INTO settings (name, value) VALUES ('proxy_slices', ?)", (str(count),))
+            row = self.conn.execute('SELECT ordinal FROM proxy_slices WHERE worker = ?', (worker,)).fetchone()
+            if row:
+                ordinal = row[0]
+            else:
+                ordinal = self.conn.execute('SELECT COUNT(*) FROM proxy_slices').fetchone()[0]
+                self.conn.execute('INSERT INTO proxy_slices (ordinal, worker) VALUES (?, ?)', (ordinal, worker))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        if ordinal >= count:
+            logging.warning(f"Worker {worker} is worker #{ordinal + 1} for {count} proxy slices: "
+                            f"it shares slice {ordinal % count}, raise --proxy-slices")
+        return ordinal % count, count
+
+    def register_output(self, path, worker):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO outputs (path, worker) VALUES (?, ?)',
+                (os.path.abspath(path), worker)
+            )
+
+    def outputs(self):
+        return [path for (path,) in self.conn.execute('SELECT path FROM outputs ORDER BY rowid')]
+
+    def summary(self):
+        """Shard counts by status"""
+        return dict(self.conn.execute('SELECT status, COUNT(*) FROM shards GROUP BY status').fetchall())
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception as e:
+            logging.warning(f"Error closing shard queue {self.path}: {e}")
+
+
+async def merge_outputs(paths, dedup, max_bytes=50 * 1024 * 1024, prefix='multi_session_final', fieldnames=FIELDNAMES):
+    """Concatenate worker CSVs into one set of output parts, dropping cross-shard duplicates"""
+    sink = CsvSink(prefix=prefix, max_bytes=max_bytes, fieldnames=fieldnames)
+    for path in paths:
+        if not os.path.exists(path):
+            logging.warning(f"Worker output {path} not found, leaving it out of the merge")
+            continue
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                if dedup.add(row):
+                    await sink.write([row])
+    await sink.close()
+    return sink
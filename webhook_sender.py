@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import random
+from datetime import datetime
+import aiohttp
+from metrics import Metrics
+
+# Statuses worth retrying; any other 4xx means the batch itself was refused
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+# Full-jitter exponential backoff: attempt n waits up to BACKOFF_BASE * 2**n seconds
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 60.0
+SPOOL_SUFFIX = '.json.gz'
+
+
+class WebhookSender:
+    """Streams result rows to a webhook in gzip-compressed JSON batches during the run.
+
+    Rows are cut into batches of `batch_size`, or whatever arrived in the
+    last `flush_interval` seconds, and a background task posts them one at
+    a time over a keep-alive connection, so scraping never waits on the
+    webhook. Each batch has a stable id, sent in the payload and as the
+    Idempotency-Key header, so the receiver can drop a batch it already
+    got. Failed posts are retried with jittered exponential backoff. A
+    batch that still fails, or that comes in while `max_pending` batches
+    are already queued, is spooled to `spool_dir` and sent again later in
+    the run or by the next run. At `close`, queued batches get a single
+    attempt each within `close_timeout` seconds; the rest go to the spool.
+    """
+
+    def __init__(self, url, run_id, batch_size=500, flush_interval=30.0, spool_dir='webhook_spool',
+                 max_retries=5, timeout=60, max_pending=20, close_timeout=60, metadata=None, metrics=None):
+        self.url = url
+        self.metrics = metrics or Metrics()
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_dir = spool_dir
+        self.max_retries = max_retries
+        self.close_timeout = close_timeout
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.metadata = metadata or {}
+        self.batches_sent = 0
+        self.rows_sent = 0
+        self.bytes_sent = 0
+        self.batches_spooled = 0
+        self.spool_resent = 0
+        self.session = None
+        self._buffer = []
+        self._sequence = 0
+        self._pending = asyncio.Queue(maxsize=max_pending)
+        self._resend_lock = asyncio.Lock()
+        self._tasks = []
+        self._closing = False
+
+    async def start(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=2, keepalive_timeout=120),
+            timeout=self.timeout
+        )
+        self._tasks = [
+            asyncio.create_task(self._deliver()),
+            asyncio.create_task(self._flush_periodically()),
+        ]
+
+    def send(self, rows):
+        """Queue rows for delivery; a full batch is handed to the sender right away"""
+        self._buffer.extend(rows)
+        while len(self._buffer) >= self.batch_size:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._enqueue(batch)
+
+    def flush(self):
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            self._enqueue(batch)
+
+    def _enqueue(self, rows):
+        self._sequence += 1
+        batch_id = f"{self.run_id}-{self._sequence:06d}"
+        payload = {
+            'batch_id': batch_id,
+            'sequence': self._sequence,
+            'timestamp': datetime.now().isoformat(),
+            **self.metadata,
+            'count': len(rows),
+            'data': rows,
+        }
+        body = gzip.compress(json.dumps(payload).encode('utf-8'))
+        try:
+            self._pending.put_nowait((batch_id, body, len(rows)))
+        except asyncio.QueueFull:
+            # The webhook is falling behind: park the batch instead of growing memory
+            self._spool(batch_id, body)
+
+    async def _post(self, batch_id, body):
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip', 'Idempotency-Key': batch_id}
+        error = None
+        # While closing, the spool is the retry: do not hold up the exit
+        attempts = 1 if self._closing else self.max_retries
+        for attempt in range(attempts):
+            try:
+                async with self.session.post(self.url, data=body, headers=headers) as response:
+                    if response.status < 300:
+                        return True
+                    error = f"HTTP {response.status}: {(await response.text())[:200]}"
+                    if response.status not in RETRY_STATUSES:
+                        break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+            if attempt + 1 < attempts:
+                await asyncio.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+        logging.error(f"Webhook batch {batch_id} failed: {error}")
+        return False
+
+    def _spool(self, batch_id, body):
+        path = os.path.join(self.spool_dir, f"{batch_id}{SPOOL_SUFFIX}")
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(body)
+        os.replace(f"{path}.tmp", path)
+        self.batches_spooled += 1
+        self.metrics.inc('webhook_batches_total', result='spooled')
+        logging.warning(f"Spooled webhook batch {batch_id} to {path}")
+
+    async def _deliver(self):
+        while True:
+            batch_id, body, count = await self._pending.get()
+            try:
+                with self.metrics.timer('webhook'):
+                    sent = await self._post(batch_id, body)
+                if sent:
+                    self.batches_sent += 1
+                    self.rows_sent += count
+                    self.bytes_sent += len(body)
+                    self.metrics.inc('webhook_batches_total', result='sent')
+                    self.metrics.inc('webhook_rows_total', count)
+                    logging.info(f"Webhook batch {batch_id}: {count} rows, {len(body) / 1024:.0f} KB gzipped")
+                else:
+                    self._spool(batch_id, body)
+            except asyncio.CancelledError:
+                # Cut off by close: keep the batch for the next run
+                self._spool(batch_id, body)
+                raise
+            except Exception as e:
+                logging.error(f"Error delivering webhook batch {batch_id}: {e}")
+                self._spool(batch_id, body)
+            finally:
+                self._pending.task_done()
+
+    def _spool_pending(self):
+        while not self._pending.empty():
+            batch_id, body, _ = self._pending.get_nowait()
+            self._spool(batch_id, body)
+            self._pending.task_done()
+
+    def spooled(self):
+        return sorted(name for name in os.listdir(self.spool_dir) if name.endswith(SPOOL_SUFFIX))
+
+    async def resend_spool(self):
+        """Post spooled batches oldest first, stopping at the first one that still fails"""
+        async with self._resend_lock:
+            for filename in self.spooled():
+                path = os.path.join(self.spool_dir, filename)
+                try:
+                    with open(path, 'rb') as f:
+                        body = f.read()
+                except FileNotFoundError:
+                    # Another process sharing the spool got to it first
+                    continue
+                if not await self._post(filename[:-len(SPOOL_SUFFIX)], body):
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self.spool_resent += 1
+                self.bytes_sent += len(body)
+                self.metrics.inc('webhook_batches_total', result='resent')
+                logging.info(f"Resent spooled webhook batch {filename}")
+
+    async def _flush_periodically(self):
+        # Batches left over from an earlier run go first
+        await self.resend_spool()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.flush()
+                if self.spooled():
+                    await self.resend_spool()
+            except Exception as e:
+                logging.error(f"Error flushing webhook batches: {e}")
+
+    def summary(self):
+        return (
+            f"{self.rows_sent} rows in {self.batches_sent} batches ({self.bytes_sent / 1024:.0f} KB gzipped), "
+            f"{self.spool_resent} spooled batches resent, {len(self.spooled())} left in {self.spool_dir}"
+        )
+
+    async def close(self):
+        """Send what is still buffered and retry the spool within `close_timeout` seconds, spool the rest, disconnect"""
+        for task in self._tasks[1:]:
+            task.cancel()
+        await asyncio.gather(*self._tasks[1:], return_exceptions=True)
+        self._closing = True
+        self.flush()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.close_timeout
+        try:
+            await asyncio.wait_for(self._pending.join(), self.close_timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Webhook still busy after {self.close_timeout:.0f}s, spooling the remaining batches")
+        self._tasks[0].cancel()
+        await asyncio.gather(self._tasks[0], return_exceptions=True)
+        self._tasks = []
+        self._spool_pending()
+        try:
+            if loop.time() < deadline:
+                await asyncio.wait_for(self.resend_spool(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            logging.warning("Webhook spool not resent before the close deadline, leaving it for the next run")
+        finally:
+            await self.session.close()
+        logging.info(f"Webhook: {self.summary()}")